@@ -3,91 +3,198 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
 from flask import (
     Flask, 
+    current_app,
     render_template, 
     request, 
     Response, 
     flash, 
     redirect, 
-    url_for
+    url_for,
+    jsonify,
+    abort,
+    stream_with_context
   )
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-import config
-from flask_migrate import Migrate
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import groupby
+from sqlalchemy.exc import IntegrityError
 
 from models import db, Venue, Artist, Show  
+import pagination
+import querycount
+import search
+import typeahead
+import exports
+import queries
+import dbpool
+import routing
+import serialize
+import cache
+import conditional
+import formatting
+import fragment_cache
+import assets
+import bookings
+import counters
+import facets
+import batch
+import geo
+import recommend
+import feed
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-app.config.from_object('config')
-moment = Moment(app)
-db.init_app(app)
-migrate = Migrate(app, db)
+moment = Moment()
+routes = []                                                                              #(rule, options, view), added to each app by create_app
+error_handlers = []                                                                      #(code, view)
+
+def route(rule, **options):
+  def register(view):
+    routes.append((rule, options, view))
+    return view
+  return register
+
+def errorhandler(code):
+  def register(view):
+    error_handlers.append((code, view))
+    return view
+  return register
+
+def create_app(config='config', cli=True):
+  """ A configured app. config is what app.config.from_object takes (the
+  module's import name by default) or a dict of settings.
+
+  cli=False is for servers (wsgi.py, asgi.py): the `flask db` and
+  `flask fyyur` commands, and Alembic and the importer they pull in, are
+  not loaded, so a new worker is ready sooner.
+  """
+  app = Flask(__name__)
+  if isinstance(config, dict):
+    app.config.from_mapping(config)
+  else:
+    app.config.from_object(config)
+  app.extensions['fyyur'] = {}                                                          #state of this app: indexes, calendars, caches
+  moment.init_app(app)
+  dbpool.init_app(app)
+  db.init_app(app)
+  routing.init_app(app)
+  pagination.init_app(app)
+  querycount.init_app(app)
+  search.init_app(app)
+  cache.init_app(app)
+  conditional.init_app(app)
+  fragment_cache.init_app(app)
+  assets.init_app(app)
+  bookings.init_app(app)
+  typeahead.init_app(app)
+  geo.init_app(app)
+  facets.init_app(app)
+  batch.init_app(app)
+  recommend.init_app(app)
+  feed.init_app(app)
+  formatting.init_app(app)                                                               #registers the 'datetime' filter
+  for rule, options, view in routes:
+    app.add_url_rule(rule, view_func=view, **options)
+  for code, view in error_handlers:
+    app.register_error_handler(code, view)
+  if cli:
+    from flask_migrate import Migrate
+    from cli import fyyur_cli
+    Migrate(app, db)
+    app.cli.add_command(fyyur_cli)
+  if not app.debug and not app.testing:
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+  return app
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Helpers.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
-app.jinja_env.filters['datetime'] = format_datetime
+def invalidate_venue_pages(venue_id):
+  # the venue's page, plus the artist pages that list the venue's name on a show tile
+  cache.invalidate('venue', venue_id)
+  artist_ids = [artist_id for artist_id, in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+  cache.invalidate('artist', *artist_ids)
+
+def invalidate_artist_pages(artist_id):
+  cache.invalidate('artist', artist_id)
+  venue_ids = [venue_id for venue_id, in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+  cache.invalidate('venue', *venue_ids)
+
+def time_range_args():
+  # ?from= and ?to= as naive datetimes like the stored ones, None when absent; 400 unless ISO 8601
+  values = []
+  for arg in ('from', 'to'):
+    try:
+      value = datetime.fromisoformat(request.args[arg]) if request.args.get(arg) else None
+    except ValueError:
+      abort(400)
+    if value is not None and value.tzinfo is not None:
+      value = value.astimezone().replace(tzinfo=None)                                    #an offset is converted to local time, like stored times
+    values.append(value)
+  return values
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+def render_home():
+  return render_template('pages/home.html', feed=feed.items())                           #one read of the precomputed feed
+
+@route('/')
 def index():
-  return render_template('pages/home.html')
+  return render_home()
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@route('/venues')
 def venues():
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
+  #       (it is: upcoming_shows_count is a column kept current by counters.py)
   local = []
-  venues = Venue.query.all()                                            #get data from database
-  locale = Venue.query.distinct(Venue.city, Venue.state).all()          #get unique city and state
-  for location in locale:
+  filters = facets.parse_filters(request.args, Venue)                                    #?genre=&city=&state=&seeking_talent=
+  page = queries.venue_page(                                                             #one page seeked on the (state, city, name) index
+    ['id', 'name', 'city', 'state', 'updated_at', 'upcoming_shows_count'],
+    query=facets.filtered(Venue, filters),
+    after=request.args.get('after'),
+    before=request.args.get('before'),
+  )
+  for (city, state), area in groupby(page, key=lambda venue: (venue["city"], venue["state"])):     #rows arrive already grouped by area
     local.append({
-      "city": location.city,
-      "state": location.state,
+      "city": city,
+      "state": state,
       "venues": [{
-        "id": venue.id,
-        "name": venue.name,
-      } for venue in venues if
-        venue.city == location.city and venue.state == location.state]  #allocate venue to their city and state
+        "id": venue["id"],
+        "name": venue["name"],
+        "updated_at": venue["updated_at"],
+        "num_upcoming_shows": venue["upcoming_shows_count"],
+      } for venue in area]
     })
-  
-  return render_template('pages/venues.html', areas=local);
 
-@app.route('/venues/search', methods=['POST'])
+  return render_template('pages/venues.html', areas=local, page=page,
+    filters=filters, facets=facets.facet_counts(Venue, filters), seeking='seeking_talent');
+
+@route('/venues/search', methods=['POST'])
 def search_venues():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   search_term = request.form.get('search_term')
-  data = Venue.query.filter(Venue.name.ilike('%{}%'.format(search_term))).all()           #get the data that match the seach_term
+  data = search.search(Venue, search_term)                                                #ranked matches on name, city, state and genres
   count = len(data)                                                                       #count the amount of result get by the query
   result={
     "count": count,
@@ -96,74 +203,77 @@ def search_venues():
 
   return render_template('pages/search_venues.html', results=result, search_term=request.form.get('search_term', ''))
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-  real_data = Venue.query.get(venue_id)                                                 #real_data is the information from the database corresponding to the venue_id 
-                                                                                        #solution from https://knowledge.udacity.com/questions/386723 by Juliano V
-  past_shows = db.session.query(Artist, Show).join(Show).join(Venue).filter(
-    Show.venue_id == venue_id,
-    Show.artist_id == Artist.id,
-    Show.start_time < datetime.now()
-  ).all()
-  past_shows_count = len(past_shows)
-
-  upcoming_shows = db.session.query(Artist, Show).join(Show).join(Venue).filter(        #get the show information and seperate it into past and upcoming by datetime
-    Show.venue_id == venue_id,
-    Show.artist_id == Artist.id,
-    Show.start_time > datetime.now()
-  ).all()
-  upcoming_shows_count = len(upcoming_shows)
-
-  real_venue = {
-    "id": real_data.id,
-    "name": real_data.name,
-    "genres": real_data.genres,
-    "address": real_data.address,
-    "city": real_data.city,
-    "state": real_data.state,
-    "phone": real_data.phone,
-    "website": real_data.website,
-    "facebook_link": real_data.facebook_link,
-    "seeking_talent": real_data.seeking_talent,
-    "seeking_description": real_data.seeking_description,
-    "image_link": real_data.image_link,
-    "past_shows": [{
-      "artist_id": artist.id,
-      "artist_name": artist.name,
-      "artist_image_link": artist.image_link,
-      "start_time": show.start_time
-    } for artist, show in past_shows],
-    "upcoming_shows": [{
-      "artist_id": artist.id,
-      "artist_name": artist.name,
-      "artist_image_link": artist.image_link,
-      "start_time": show.start_time
-    } for artist, show in upcoming_shows],
-    "past_shows_count": past_shows_count,
-    "upcoming_shows_count": upcoming_shows_count,
-  }
+@route('/api/typeahead')
+def typeahead_names():
+  # answered from the in-process prefix index, no database round trip once it is loaded
+  # but for a version check every LOCAL_INDEX_MAX_AGE seconds
+  limit = min(request.args.get('limit', 10, type=int), 50)
+  results = typeahead.ensure_loaded().lookup(request.args.get('q', ''), limit=limit)
+  return jsonify(results=results)
+
+def render_venue(venue_id):
+  real_venue = queries.venue_detail(venue_id)                                            #the venue and all of its shows in one round trip
+  if real_venue is None:
+    abort(404)
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
   
-  return render_template('pages/show_venue.html', venue=real_venue)
+  return render_template('pages/show_venue.html', venue=real_venue,
+                         suggested_artists=recommend.suggestions('venue', venue_id))
+
+@route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+  # answered with 304 when the client's copy is current, else from the page cache,
+  # which keeps rendered pages per venue and etag until an edit or a new show invalidates them
+  validators = conditional.venue_validators(venue_id)
+  return conditional.respond(
+    validators,
+    lambda: cache.cached_page('venue', venue_id, validators.etag, lambda: render_venue(venue_id))
+  )
+
+@route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+  # booked shows and the free slots between them, from the venue's interval index
+  start, end = time_range_args()
+  start = start or datetime.now().replace(second=0, microsecond=0)
+  end = end or start + timedelta(days=7)
+  if end <= start or end - start > timedelta(days=current_app.config['AVAILABILITY_MAX_DAYS']):
+    abort(400)
+  if db.session.query(Venue.id).filter(Venue.id == venue_id).scalar() is None:
+    abort(404)
+  booked = bookings.booked(venue_id, start, end)
+  return serialize.json_response({
+    "venue_id": venue_id,
+    "from": start,
+    "to": end,
+    "booked": [{"show_id": show_id, "start_time": show_start, "end_time": show_end} for show_start, show_end, show_id in booked],
+    "free": [{"start_time": free_start, "end_time": free_end} for free_start, free_end in bookings.free_slots(booked, start, end)],
+  })
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@route('/venues/create', methods=['GET'])
 def create_venue_form():
+  from forms import VenueForm                                                           #wtforms loads with the first form view, not at startup
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@route('/venues/create', methods=['POST'])
 def create_venue_submission():
+  from forms import VenueForm
   form = VenueForm(request.form, meta={'csrf': False})
   if form.validate():
     try:
       venue = Venue()
       form.populate_obj(venue)
       db.session.add(venue)
+      db.session.flush()
+      feed.listed('venue', [venue.id])                                                   #same transaction as the venue
       db.session.commit()
+      typeahead.record_venue(venue)
+      geo.record_venue(venue)
+      recommend.refresh('venue', [venue.id])
       flash('Venue ' + form.name.data + ' was successfully listed!')
     except ValueError as e:
       print(e)
@@ -185,14 +295,21 @@ def create_venue_submission():
   # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
 
-@app.route('/venues/<venue_id>', methods=['POST'])
+@route('/venues/<venue_id>', methods=['POST'])
 def delete_venue(venue_id):
   # TODO: Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
   try:
     venue = Venue.query.get(venue_id)
+    suggested_to = recommend.suggested_to('venue', venue.id)                           #artists whose suggestions lose the venue
     db.session.delete(venue)
+    feed.forget('venue', venue.id)
     db.session.commit()
+    typeahead.forget_venue(venue_id)
+    bookings.calendars().forget(venue_id)
+    geo.forget_venue(venue_id)
+    recommend.rebuild('artist', suggested_to)
+    cache.invalidate('venue', venue_id)
     flash('The Venue has been successfully deleted!')
   except ValueError as e:
     print(e)
@@ -207,21 +324,28 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@route('/artists')
 def artists():
   # TODO: replace with real data returned from querying the database
 
-  real_artists = Artist.query.all()
+  filters = facets.parse_filters(request.args, Artist)                                   #?genre=&city=&state=&seeking_venue=
+  real_artists = queries.artist_page(
+    ['id', 'name', 'updated_at', 'upcoming_shows_count'],
+    query=facets.filtered(Artist, filters),
+    after=request.args.get('after'),
+    before=request.args.get('before'),
+  )
 
-  return render_template('pages/artists.html', artists=real_artists)
+  return render_template('pages/artists.html', artists=real_artists, page=real_artists,
+    filters=filters, facets=facets.facet_counts(Artist, filters), seeking='seeking_venue')
 
-@app.route('/artists/search', methods=['POST'])
+@route('/artists/search', methods=['POST'])
 def search_artists():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
   search_term = request.form.get('search_term')
-  data = Artist.query.filter(Artist.name.ilike('%{}%'.format(search_term))).all()
+  data = search.search(Artist, search_term)
   count = len(data)
   result={
     "count": count,
@@ -230,68 +354,38 @@ def search_artists():
   
   return render_template('pages/search_artists.html', results=result, search_term=request.form.get('search_term', ''))
 
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
+def render_artist(artist_id):
   # shows the artist page with the given artist_id
   # TODO: replace with real artist data from the artist table, using artist_id
   
-  real_data = Artist.query.get(artist_id)                                                 #real_data is the information from the database corresponding to the venue_id 0
-                                                                                          #solution from https://knowledge.udacity.com/questions/386723 by Juliano V
-  past_shows = db.session.query(Venue, Show).join(Show).join(Artist).filter(
-    Show.venue_id == Venue.id,
-    Show.artist_id == artist_id,
-    Show.start_time < datetime.now()
-  ).all()
-  past_shows_count = len(past_shows)
-
-  upcoming_shows = db.session.query(Venue, Show).join(Show).join(Artist).filter(
-    Show.venue_id == Venue.id,
-    Show.artist_id == artist_id,
-    Show.start_time > datetime.now()
-  ).all()
-  upcoming_shows_count = len(upcoming_shows)
-
-  real_artist = {
-    "id": real_data.id,
-    "name": real_data.name,
-    "genres": real_data.genres,
-    "city": real_data.city,
-    "state": real_data.state,
-    "phone": real_data.phone,
-    "facebook_link": real_data.facebook_link,
-    "website": real_data.website_link,
-    "seeking_venue": real_data.seeking_venue,
-    "seeking_description": real_data.seeking_description,
-    "image_link": real_data.image_link,
-    "past_shows": [{
-      "venue_id": venue.id,
-      "venue_name": venue.name,
-      "venue_image_link": venue.image_link,
-      "start_time": show.start_time
-    } for venue, show in past_shows],
-    "upcoming_shows": [{
-      "venue_id": venue.id,
-      "venue_name": venue.name,
-      "venue_image_link": venue.image_link,
-      "start_time": show.start_time
-    } for venue, show in upcoming_shows],
-    "past_shows_count": past_shows_count,
-    "upcoming_shows_count": upcoming_shows_count,
-  }
-  return render_template('pages/show_artist.html', artist=real_artist)
+  real_artist = queries.artist_detail(artist_id)                                         #the artist and all of its shows in one round trip
+  if real_artist is None:
+    abort(404)
+  return render_template('pages/show_artist.html', artist=real_artist,
+                         suggested_venues=recommend.suggestions('artist', artist_id))
+
+@route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+  validators = conditional.artist_validators(artist_id)
+  return conditional.respond(
+    validators,
+    lambda: cache.cached_page('artist', artist_id, validators.etag, lambda: render_artist(artist_id))
+  )
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
+  from forms import ArtistForm
   real_data = Artist.query.get(artist_id)   
   form = ArtistForm(obj=real_data)
 
   # TODO: populate form with fields from artist with ID <artist_id>
   return render_template('forms/edit_artist.html', form=form, artist=real_data)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
+  from forms import ArtistForm
   form = ArtistForm(request.form, meta={'csrf': False})
   if form.validate():
     try:
@@ -311,7 +405,12 @@ def edit_artist_submission(artist_id):
       update_artist.seeking_venue = form.seeking_venue.data
       update_artist.seeking_description = form.seeking_description.data
 
+      db.session.flush()
+      feed.edited('artist', artist_id)
       db.session.commit()
+      typeahead.record_artist(update_artist)
+      invalidate_artist_pages(artist_id)
+      recommend.refresh('artist', [artist_id])
       flash('Artist ' + form.name.data +' updated!')
     except ValueError as e:
       print(e)
@@ -329,16 +428,18 @@ def edit_artist_submission(artist_id):
 
   return redirect(url_for('show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
+  from forms import VenueForm
   real_data = Venue.query.get(venue_id)   
   form = VenueForm(obj=real_data)                                             
 
   # TODO: populate form with values from venue with ID <venue_id>
   return render_template('forms/edit_venue.html', form=form, venue=real_data)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
+  from forms import VenueForm
   # TODO: take values from the form submitted, and update existing
   # venue record with ID <venue_id> using the new attributes
 
@@ -361,8 +462,16 @@ def edit_venue_submission(venue_id):
       update_venue.website = form.website_link.data
       update_venue.seeking_talent = form.seeking_talent.data
       update_venue.seeking_description = form.seeking_description.data
+      update_venue.latitude = form.latitude.data
+      update_venue.longitude = form.longitude.data
 
+      db.session.flush()
+      feed.edited('venue', venue_id)
       db.session.commit()
+      typeahead.record_venue(update_venue)
+      geo.record_venue(update_venue)
+      invalidate_venue_pages(venue_id)
+      recommend.refresh('venue', [venue_id])
       flash('Venue ' + form.name.data +' updated!')
     except ValueError as e:
       print(e)
@@ -381,14 +490,16 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@route('/artists/create', methods=['GET'])
 def create_artist_form():
+  from forms import ArtistForm
   form = ArtistForm()
   
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@route('/artists/create', methods=['POST'])
 def create_artist_submission():
+  from forms import ArtistForm
   form = ArtistForm(request.form, meta={'csrf': False})
   # called upon submitting the new artist listing form
   # TODO: insert form data as a new Venue record in the db, instead
@@ -398,7 +509,11 @@ def create_artist_submission():
       artist = Artist()
       form.populate_obj(artist)
       db.session.add(artist)
+      db.session.flush()
+      feed.listed('artist', [artist.id])
       db.session.commit()
+      typeahead.record_artist(artist)
+      recommend.refresh('artist', [artist.id])
       flash('Artist ' + form.name.data + ' was successfully listed!')
     except ValueError as e:
       print(e)
@@ -414,40 +529,40 @@ def create_artist_submission():
   # on successful db insert, flash success
   # TODO: on unsuccessful db insert, flash an error instead.
   # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
-  return render_template('pages/home.html')
+  return render_home()
 
 
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@route('/shows')
 def shows():
+  return conditional.respond(conditional.shows_validators(), render_shows)
+
+def render_shows():
   # displays list of shows at /shows
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
-  all_show = []
-  real_show = Show.query.join(Venue, Show.venue_id == Venue.id).join(Artist, Artist.id == Show.artist_id).all()
-  for show in real_show:
-    i_shows = {
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time
-    }
-    all_show.append(i_shows)
-  
-  return render_template('pages/shows.html', shows=all_show)
+  real_show = queries.show_page(
+    ['id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time',
+     'updated_at', 'venue_updated_at', 'artist_updated_at'],
+    after=request.args.get('after'),
+    before=request.args.get('before'),
+  )
+  all_show = real_show.items
+
+  return render_template('pages/shows.html', shows=all_show, page=real_show)
 
-@app.route('/shows/create')
+@route('/shows/create')
 def create_shows():
+  from forms import ShowForm
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@route('/shows/create', methods=['POST'])
 def create_show_submission():
+  from forms import ShowForm
   # called to create new shows in the db, upon submitting new show listing form
   # TODO: insert form data as a new Show record in the db, instead
   form = ShowForm(request.form, meta={'csrf': False})
@@ -455,14 +570,22 @@ def create_show_submission():
     try:
       new_show = Show(
         start_time = form.start_time.data,
-        artist_id = form.artist_id.data,
-        venue_id = form.venue_id.data
+        end_time = bookings.end_time(form.start_time.data, form.duration.data),
+        artist_id = int(form.artist_id.data),
+        venue_id = int(form.venue_id.data)
       )
-      db.session.add(new_show)
+      bookings.book(new_show)                                                            #raises DoubleBooking when the venue is taken
+      feed.booked([new_show.id])
+      counters.shows_added([new_show])
       db.session.commit()
+      cache.invalidate('venue', new_show.venue_id)                                      #both sides now list the show
+      cache.invalidate('artist', new_show.artist_id)
       # on successful db insert, flash success
       flash('Show was successfully listed!')
   # TODO: on unsuccessful db insert, flash an error instead.
+    except bookings.DoubleBooking as e:
+      db.session.rollback()
+      flash(str(e) + ' Show could not be listed.')
     except ValueError as e:
       print(e)
       db.session.rollback()
@@ -476,38 +599,144 @@ def create_show_submission():
       flash(message)
   # e.g., flash('An error occurred. Show could not be listed.')
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-  return render_template('pages/home.html')
+  return render_home()
+
+#  API
+#  ----------------------------------------------------------------
+
+def api_fields(allowed):
+  # ?fields= sparse fieldset, unknown names are a 400
+  try:
+    return queries.parse_fields(request.args.get('fields'), allowed)
+  except ValueError as e:
+    abort(serialize.json_response({"error": str(e)}, 400))
+
+def api_page(page):
+  return serialize.json_response({
+    "data": page.items,
+    "next": page.next_cursor,
+    "prev": page.prev_cursor,
+  })
+
+def api_limit(default):
+  # ?limit=, within 1..API_MAX_PAGE_SIZE
+  return max(1, min(request.args.get('limit', default, type=int), current_app.config['API_MAX_PAGE_SIZE']))
+
+def api_cursor():
+  return dict(
+    after=request.args.get('after'),
+    before=request.args.get('before'),
+    page_size=api_limit(current_app.config['PAGE_SIZE']),
+  )
+
+@route('/api/v1/venues')
+def api_venues():
+  query = facets.filtered(Venue, facets.parse_filters(request.args, Venue))
+  return api_page(queries.venue_page(api_fields(queries.VENUE_FIELDS), query=query, **api_cursor()))
+
+@route('/api/v1/venues/near')
+def api_venues_near():
+  # ?lat=&lng= and either radius_km= (every venue that close) or neither (the nearest ones),
+  # nearest first, at most ?limit=; answered from the spatial index
+  lat, lng = request.args.get('lat', type=float), request.args.get('lng', type=float)
+  radius_km = request.args.get('radius_km', type=float)
+  if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+    abort(serialize.json_response({"error": "lat and lng are required, in degrees"}, 400))
+  if radius_km is not None and radius_km <= 0:
+    abort(serialize.json_response({"error": "radius_km must be positive"}, 400))
+  limit = api_limit(20)
+  return serialize.json_response({"data": geo.near(lat, lng, radius_km, limit)})
+
+@route('/api/v1/venues/<int:venue_id>')
+def api_venue(venue_id):
+  venue = queries.venue_detail(venue_id, api_fields(list(queries.VENUE_FIELDS) + list(queries.DETAIL_SHOW_FIELDS)))
+  if venue is None:
+    abort(serialize.json_response({"error": "Venue not found"}, 404))
+  return serialize.json_response(venue)
+
+@route('/api/v1/artists')
+def api_artists():
+  query = facets.filtered(Artist, facets.parse_filters(request.args, Artist))
+  return api_page(queries.artist_page(api_fields(queries.ARTIST_FIELDS), query=query, **api_cursor()))
+
+@route('/api/v1/artists/<int:artist_id>')
+def api_artist(artist_id):
+  artist = queries.artist_detail(artist_id, api_fields(list(queries.ARTIST_FIELDS) + list(queries.DETAIL_SHOW_FIELDS)))
+  if artist is None:
+    abort(serialize.json_response({"error": "Artist not found"}, 404))
+  return serialize.json_response(artist)
+
+@route('/api/v1/<any(venues, artists):kind>/<int:id>/suggestions')
+def api_suggestions(kind, id):
+  # suggested artists of a venue / venues of an artist, best first, from the recommendation table
+  limit = max(1, min(request.args.get('limit', current_app.config['RECOMMENDATIONS_K'], type=int), current_app.config['RECOMMENDATIONS_K']))
+  return serialize.json_response({"data": recommend.suggestions(kind[:-1], id, limit)})
+
+@route('/api/v1/shows')
+def api_shows():
+  return api_page(queries.show_page(api_fields(queries.SHOW_FIELDS), **api_cursor()))
+
+@route('/api/v1/<any(venues, artists, shows):kind>/batch', methods=['POST'])
+def api_batch_create(kind):
+  # a JSON array of records in the shape the html forms post, validated by the same rules;
+  # the valid ones are inserted in one transaction and every record gets its own result
+  records = request.get_json(silent=True)
+  if not isinstance(records, list):
+    abort(serialize.json_response({"error": "Expected a JSON array of records"}, 400))
+  if len(records) > current_app.config['BATCH_MAX_RECORDS']:
+    abort(serialize.json_response({"error": "At most {} records per batch".format(current_app.config['BATCH_MAX_RECORDS'])}, 413))
+  try:
+    results = batch.create_records(kind, records)
+  except IntegrityError as e:                                                            #lost a race, e.g. a venue booked meanwhile
+    db.session.rollback()
+    abort(serialize.json_response({"error": "Conflicting change, nothing was created: " + str(e.orig).strip()}, 409))
+  created = sum("id" in result for result in results)
+  return serialize.json_response({"created": created, "rejected": len(results) - created, "results": results})
+
+#  Metrics
+#  ----------------------------------------------------------------
 
-@app.errorhandler(404)
+@route('/metrics/pool')
+def pool_metrics():
+  # checkout wait and saturation of this worker's connection pools
+  return serialize.json_response({
+    "primary": dbpool.pool_metrics(db.engine),
+    "replicas": [dbpool.pool_metrics(engine) for engine in routing.replica_engines()],
+  })
+
+#  Exports
+#  ----------------------------------------------------------------
+
+@route('/export/<any(shows, venues, artists):kind>.<any(csv, ndjson):format>')
+def export(kind, format):
+  # rows are streamed from a server-side cursor, memory stays flat whatever the table size
+  start, end = time_range_args()
+  query = exports.export_query(kind, start, end)
+  return Response(
+    stream_with_context(exports.stream_rows(query, format)),
+    mimetype=exports.FORMATS[format],
+    headers={'Content-Disposition': 'attachment; filename={}.{}'.format(kind, format)}
+  )
+
+@errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
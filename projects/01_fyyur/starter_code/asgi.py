@@ -0,0 +1,161 @@
+import asyncio
+import io
+import os
+import re
+import sys
+from datetime import datetime
+from urllib.parse import unquote
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import abort, current_app, render_template, session
+
+import cache
+import conditional
+import queries
+import recommend
+from app import create_app
+from asyncdb import AsyncDatabase
+
+# the template and the suggestions shown on each kind of page
+PAGES = {
+    'venue': ('pages/show_venue.html', 'venue', 'suggested_artists'),
+    'artist': ('pages/show_artist.html', 'artist', 'suggested_venues'),
+}
+
+ROUTES = (
+    (re.compile(r'^/venues/(\d+)$'), 'venue'),
+    (re.compile(r'^/artists/(\d+)$'), 'artist'),
+)
+
+
+async def render_detail(database, kind, id):
+    now = datetime.now()
+    entity, past, upcoming = queries.detail_statements(kind, id, now)
+    entity, past, upcoming, suggested = await asyncio.gather(
+        database.first(entity),
+        database.all(past),
+        database.all(upcoming),
+        database.all(recommend.suggestions_statement(kind, id, current_app.config['RECOMMENDATIONS_K'])),
+    )
+    detail = queries.assemble_detail(kind, entity, past, upcoming)
+    if detail is None:
+        abort(404)
+    template, name, suggestions = PAGES[kind]
+    return render_template(template, **{name: detail, suggestions: [dict(row._mapping) for row in suggested]})
+
+
+async def detail_page(database, kind, id):
+    """ show_venue/show_artist: a 304 from the validators, else the page cache, else a render """
+    validators = conditional.detail_validators(
+        kind, id, await database.first(conditional.detail_validators_statement(kind, id, datetime.now()))
+    )
+    if validators is None:
+        abort(404)
+    html = None
+    if '_flashes' in session:
+        html = await render_detail(database, kind, id)                 #one-off, never cached
+    elif not conditional.is_fresh(validators):
+        html = cache.get_page(kind, id, validators.etag)
+        if html is None:
+            html = await render_detail(database, kind, id)
+            cache.set_page(kind, id, validators.etag, html)
+    return conditional.respond(validators, lambda: html)
+
+
+def _environ(scope):
+    """ The WSGI environ of a bodiless ASGI request, for Flask's request context """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': unquote(scope['path']),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        environ[name] = environ[name] + ',' + value if name in environ else value
+    return environ
+
+
+class AsyncFyyur(object):
+    """ The app under an ASGI server: `uvicorn asgi:application --workers 4`
+
+    The venue and artist pages run on the event loop: their validators, then
+    on a cache miss the entity, its past shows, its upcoming shows and its
+    suggestions, each on its own connection of the async engine and all four
+    at once. A worker waits on Postgres without holding a thread, so one
+    process carries many concurrent page views. Every other route is the
+    WSGI app, run in asgiref's thread pool.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.database = AsyncDatabase(app)
+        self.wsgi = WsgiToAsgi(app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            for pattern, kind in ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    return await self.page(scope, send, kind, int(match.group(1)))
+        return await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.database.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def page(self, scope, send, kind, id):
+        """ Flask's full_dispatch_request around an async view: before/after
+        request hooks, error handlers and the session all behave as for a WSGI route
+        """
+        app = self.app
+        context = app.request_context(_environ(scope))
+        context.push()
+        error = None
+        try:
+            try:
+                try:
+                    response = app.preprocess_request()
+                    if response is None:
+                        response = await detail_page(self.database, kind, id)
+                except Exception as e:
+                    response = app.handle_user_exception(e)
+                response = app.finalize_request(response)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            body = response.get_data() if scope['method'] != 'HEAD' else b''
+        finally:
+            context.pop(error)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+application = AsyncFyyur(create_app(os.environ.get('FYYUR_CONFIG', 'config'), cli=False))
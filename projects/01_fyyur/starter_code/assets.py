@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+from werkzeug.exceptions import NotFound
+
+MANIFEST = 'manifest.json'
+
+# text formats worth precompressing; images and woff are compressed already
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.otf', '.ttf', '.eot', '.json', '.txt')
+
+# Content-Encoding -> suffix of the precompressed variant, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def _fingerprint(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    root, ext = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, digest, ext)
+
+
+def _rewrite_css(path, content, manifest):
+    """ Point url(...) references of a stylesheet at the fingerprinted files """
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        quote, target = match.group(1), match.group(2)
+        if target.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        split = min(position for position in (target.find('?'), target.find('#'), len(target)) if position >= 0)
+        name, suffix = target[:split], target[split:]
+        built = manifest.get(posixpath.normpath(posixpath.join(directory, name)))
+        if built is None:
+            return match.group(0)
+        return 'url({0}{1}{2}{0})'.format(quote, posixpath.relpath(built, directory), suffix)
+
+    return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def _brotli():
+    """ The brotli module, None when it is not installed (gzip variants only).
+    Only the build compresses, so the app does not import it when serving.
+    """
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _write(path, content, compress, brotli):
+    with open(path, 'wb') as output:
+        output.write(content)
+    if not compress:
+        return
+    with gzip.GzipFile(path + '.gz', 'wb', compresslevel=9, mtime=0) as output:
+        output.write(content)
+    if brotli is not None:
+        with open(path + '.br', 'wb') as output:
+            output.write(brotli.compress(content, quality=11))
+
+
+def build(source, target):
+    """ Copy every file under source into target with a content hash in its name,
+    plus .gz and .br variants, and write the logical -> built name manifest.
+
+    Stylesheets go last, so the fonts and images they reference are already
+    fingerprinted and their url(...)s can be rewritten before hashing them.
+    """
+    target_name = os.path.relpath(os.path.abspath(target), os.path.abspath(source))
+    paths = []
+    for directory, directories, files in os.walk(source):
+        relative = os.path.relpath(directory, source)
+        if relative == target_name:
+            directories[:] = []
+            continue
+        directories[:] = [name for name in directories if os.path.join(relative, name) != target_name]
+        for name in files:
+            paths.append(posixpath.normpath(posixpath.join(relative.replace(os.sep, '/'), name)))
+    paths.sort(key=lambda path: (path.endswith('.css'), path))
+
+    brotli = _brotli()
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    manifest = {}
+    for path in paths:
+        with open(os.path.join(source, path), 'rb') as input:
+            content = input.read()
+        if path.endswith('.css'):
+            content = _rewrite_css(path, content, manifest)
+        built = _fingerprint(path, content)
+        os.makedirs(os.path.join(target, posixpath.dirname(built)), exist_ok=True)
+        _write(os.path.join(target, built), content, path.endswith(COMPRESSIBLE), brotli)
+        manifest[path] = built
+    with open(os.path.join(target, MANIFEST), 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(target):
+    try:
+        with open(os.path.join(target, MANIFEST)) as input:
+            return json.load(input)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(filename):
+    """ url of the fingerprinted build of a static file, the plain static url
+    when it was not built (e.g. in development before `flask fyyur assets`)
+    """
+    built = current_app.extensions['assets'].get(filename)
+    if built is None:
+        return url_for('static', filename=filename)
+    return url_for('assets', filename=built)
+
+
+def serve(filename):
+    """ A fingerprinted file, precompressed when the client accepts it.
+
+    Its name changes with its content, so it can be cached for a year
+    and never revalidated.
+    """
+    if filename == MANIFEST:
+        raise NotFound()
+    folder = current_app.config['ASSETS_FOLDER']
+    max_age = current_app.config['ASSETS_MAX_AGE']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename, mimetype=mimetype, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+
+@click.command('assets')
+@with_appcontext
+def assets_command():
+    """ Fingerprint and precompress static/ into ASSETS_FOLDER. """
+    manifest = build(current_app.static_folder, current_app.config['ASSETS_FOLDER'])
+    click.echo('Built {} assets into {}{}.'.format(
+        len(manifest), current_app.config['ASSETS_FOLDER'],
+        '' if _brotli() is not None else ' (gzip only, install Brotli for .br variants)'
+    ))
+
+
+def init_app(app):
+    """ Serve the output of `flask fyyur assets` under /assets and expose
+    asset_url() to templates. Rebuilding needs a restart to pick up the manifest.
+    """
+    app.config.setdefault('ASSETS_FOLDER', os.path.join(app.static_folder, 'dist'))
+    app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    app.extensions['assets'] = load_manifest(app.config['ASSETS_FOLDER'])
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve)
+    app.add_template_global(asset_url)
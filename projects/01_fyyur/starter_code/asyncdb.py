@@ -0,0 +1,61 @@
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# sync driver -> asyncio driver of the same database
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def engine_options(config):
+    """ The DB_* pool settings, for asyncpg: the pool is per event loop, i.e. per
+    ASGI worker, and statement_timeout travels as a server setting
+    """
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+    return options
+
+
+class AsyncDatabase(object):
+    """ An AsyncEngine on the app's database, for the statements built from
+    models.py that asgi.py runs without blocking its event loop.
+
+    The engine is created on first use, inside the running loop its
+    connections belong to, and disposed of by the ASGI lifespan shutdown.
+    """
+
+    def __init__(self, app):
+        self.url = async_url(app.config.get('ASYNC_DATABASE_URI') or app.config['SQLALCHEMY_DATABASE_URI'])
+        self.options = engine_options(app.config)
+        self.engine = None
+
+    def get_engine(self):
+        if self.engine is None:
+            self.engine = create_async_engine(self.url, **self.options)
+        return self.engine
+
+    async def all(self, statement):
+        async with self.get_engine().connect() as connection:
+            return (await connection.execute(statement)).all()
+
+    async def first(self, statement):
+        async with self.get_engine().connect() as connection:
+            return (await connection.execute(statement)).first()
+
+    async def dispose(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
@@ -0,0 +1,65 @@
+import counters
+import feed
+import geo
+import importer
+import recommend
+import typeahead
+from models import db
+
+# kind -> typeahead kind of its names, shows have none
+NAMED = {
+    'venues': 'venue',
+    'artists': 'artist',
+}
+
+
+def create_records(kind, records):
+    """ Validate every record with the kind's form, then insert all valid ones
+    in one transaction. Invalid records are skipped, not fatal.
+
+    Returns one result per record, in order: {"index", "id"} when created,
+    {"index", "errors"} when rejected.
+    """
+    model, form_name, fields = importer.KINDS[kind]
+    form = importer.form_class(kind)(formdata=None, meta={'csrf': False})  #not the request body, records are fed one by one
+    results = [None] * len(records)
+    valid = []
+    for position, record in enumerate(records):
+        row, errors = importer.validate_record(kind, form, record)
+        if errors:
+            results[position] = {"index": position, "errors": errors}
+        else:
+            valid.append((position, row))
+    if kind == 'shows' and valid:
+        valid, rejected = importer.check_shows(valid)
+        for position, errors in rejected:
+            results[position] = {"index": position, "errors": errors}
+
+    # one flush sends the inserts as multi-row INSERT ... RETURNING id batches
+    objects = [model(**row) for position, row in valid]
+    db.session.add_all(objects)
+    db.session.flush()
+    created = [(position, obj.id) for (position, row), obj in zip(valid, objects)]
+    if kind in NAMED:
+        feed.listed(NAMED[kind], [obj.id for obj in objects])
+    else:
+        feed.booked([obj.id for obj in objects])
+        counters.shows_added([row for position, row in valid])
+    names = [(obj.id, obj.name) for obj in objects] if kind in NAMED else None
+    points = [(obj.id, obj.latitude, obj.longitude) for obj in objects] if kind == 'venues' else None
+    db.session.commit()
+
+    for position, id in created:
+        results[position] = {"index": position, "id": id}
+    if kind in NAMED:
+        typeahead.record_names(NAMED[kind], names)
+        recommend.refresh(NAMED[kind], [id for id, name in names])
+    else:
+        importer.shows_written([row for position, row in valid])
+    if kind == 'venues':
+        geo.record_points(points)
+    return results
+
+
+def init_app(app):
+    app.config.setdefault('BATCH_MAX_RECORDS', 1000)
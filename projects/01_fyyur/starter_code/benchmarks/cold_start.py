@@ -0,0 +1,55 @@
+""" Cold start of a server worker: a fresh interpreter importing wsgi.py.
+
+Run from starter_code/:  python -m benchmarks.cold_start [runs] [budget_ms]
+
+Every run is a new process, as when an autoscaler adds a worker, timed from
+its launch until wsgi.application is built (no database connection is made).
+Prints the best and median run and the imports that cost the most, and
+exits with status 1 when the median is over the budget, COLD_START_BUDGET_MS
+of config.py by default.
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+import config
+
+ENTRY = 'import wsgi'
+
+
+def cold_start():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', ENTRY], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def slowest_imports(count=8, depth=2):
+    """ (ms, module) of the costliest imports at most depth levels down, from python -X importtime """
+    log = subprocess.run([sys.executable, '-X', 'importtime', '-c', ENTRY],
+                         capture_output=True, text=True, check=True).stderr
+    found = []
+    for line in log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if (len(name) - len(name.lstrip())) // 2 <= depth:
+            found.append((int(cumulative_us) / 1000, name.strip()))
+    return sorted(found, reverse=True)[:count]
+
+
+def main(runs=10, budget=config.COLD_START_BUDGET_MS):
+    cold_start()                                       #warm the file system cache, like a host that has run the app
+    times = [cold_start() for run in range(runs)]
+    median = statistics.median(times)
+    print('{} cold starts: best {:.0f} ms, median {:.0f} ms, budget {} ms'.format(runs, min(times), median, budget))
+    print('slowest imports:')
+    for took, name in slowest_imports():
+        print('  {:8.1f} ms  {}'.format(took, name))
+    if median > budget:
+        print('over budget by {:.0f} ms'.format(median - budget))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,55 @@
+""" Micro-benchmark of the 'datetime' template filter.
+
+Run from starter_code/:  python -m benchmarks.format_datetime [rows]
+
+Compares the original filter (dateutil parse + babel.dates.format_datetime
+on every call) with formatting.format_datetime, with and without the memo,
+over one /shows page worth of show times.
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+import formatting
+
+
+def legacy_format_datetime(value, format='medium'):
+    # the filter as it was in app.py
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main(rows=2000):
+    start = datetime(2026, 5, 1, 20, 0)
+    # a page repeats times: shows are booked on the hour
+    times = [start + timedelta(hours=position % 200) for position in range(rows)]
+    strings = [str(value) for value in times]
+    memoized = formatting.memoized(4096)
+
+    for value, text in zip(times, strings):
+        assert formatting.format_datetime(value, 'full') == legacy_format_datetime(text, 'full')
+        assert formatting.format_datetime(value, 'short') == legacy_format_datetime(text, 'short')   #babel's own
+
+    cases = [
+        ('legacy, str input', lambda: [legacy_format_datetime(text, 'full') for text in strings]),
+        ('cached pattern, str input', lambda: [formatting.format_datetime(text, 'full') for text in strings]),
+        ('cached pattern, datetime input', lambda: [formatting.format_datetime(value, 'full') for value in times]),
+        ('memoized, datetime input', lambda: [memoized(value, 'full') for value in times]),
+    ]
+    baseline = None
+    print('{} rows per run, best of 5'.format(rows))
+    for name, run in cases:
+        best = min(timeit.repeat(run, number=1, repeat=5))
+        baseline = baseline or best
+        print('{:<32} {:8.2f} ms  {:6.1f}x'.format(name, best * 1000, baseline / best))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,249 @@
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import and_, event, func
+from sqlalchemy.exc import IntegrityError
+
+import cache
+from models import db, Show
+
+# created by the show durations migration, needs btree_gist
+EXCLUSION_CONSTRAINT = 'ex_show_venue_no_overlap'
+EXCLUSION_VIOLATION = '23P01'
+
+
+class DoubleBooking(ValueError):
+    def __init__(self, venue_id, start_time, end_time):
+        super(DoubleBooking, self).__init__(
+            'Venue {} is already booked between {:%Y-%m-%d %H:%M} and {:%Y-%m-%d %H:%M}.'.format(
+                venue_id, start_time, end_time
+            )
+        )
+        self.venue_id = venue_id
+
+
+def end_time(start_time, duration_minutes):
+    return start_time + timedelta(minutes=duration_minutes)
+
+
+class IntervalIndex(object):
+    """ The bookings of one venue as disjoint [start, end) intervals, sorted by start.
+
+    Bookings never overlap, so the ends are sorted too: the first interval
+    that can overlap a window is one binary search away, and the scan stops
+    at the first interval starting after the window.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._ids = []
+
+    def overlapping(self, start, end):
+        """ (start, end, show id) of every booking overlapping [start, end) """
+        position = bisect_right(self._ends, start)
+        found = []
+        while position < len(self._starts) and self._starts[position] < end:
+            found.append((self._starts[position], self._ends[position], self._ids[position]))
+            position += 1
+        return found
+
+    def add(self, start, end, show_id):
+        if start >= end:
+            return                                    #empty, like an empty tsrange it overlaps nothing
+        if self.overlapping(start, end):
+            raise ValueError('overlapping booking')
+        position = bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._ends.insert(position, end)
+        self._ids.insert(position, show_id)
+
+    def __len__(self):
+        return len(self._starts)
+
+
+class _Calendars(object):
+    """ IntervalIndex per venue, loaded from the database on first use.
+
+    Only the non-Postgres stand-in relies on these. A show written by another
+    process drops its venue's calendar within LOCAL_INDEX_MAX_AGE (a deleted
+    one, all of them); book() itself is only safe from double bookings
+    within one process.
+
+    A booked show is held until its transaction ends, so a concurrent book()
+    sees it too, and joins its venue's calendar only once it is committed.
+    """
+
+    def __init__(self):
+        self._venues = {}
+        self._held = []
+        self.changes = cache.TableChanges(Show, Show.venue_id)
+        self.lock = threading.RLock()
+
+    def get(self, venue_id):
+        with self.lock:
+            reload, rows = self.changes.poll()
+            if reload:
+                self._venues = {}
+            for changed_venue_id, in rows:
+                self._venues.pop(changed_venue_id, None)
+            calendar = self._venues.get(venue_id)
+            if calendar is None:
+                calendar = IntervalIndex()
+                for start, end, show_id in db.session.query(
+                    Show.start_time, Show.end_time, Show.id
+                ).filter(Show.venue_id == venue_id).order_by(Show.start_time):
+                    calendar.add(start, end, show_id)
+                self._venues[venue_id] = calendar
+            return calendar
+
+    def taken(self, venue_id, start, end):
+        """ True when [start, end) overlaps a committed or held booking of the venue """
+        with self.lock:
+            return bool(self.get(venue_id).overlapping(start, end)) or any(
+                held_venue_id == venue_id and held_start < end and held_end > start
+                for held_venue_id, held_start, held_end, show_id in self._held
+            )
+
+    def hold(self, session, show):
+        """ Reserve the slot of a flushed show until the session's transaction ends """
+        booking = (show.venue_id, show.start_time, show.end_time, show.id)
+        with self.lock:
+            self._held.append(booking)
+        session.info.setdefault('bookings', {}).setdefault(self, []).append(booking)
+
+    def committed(self, bookings):
+        with self.lock:
+            for venue_id, start, end, show_id in bookings:
+                calendar = self._venues.get(venue_id)
+                if calendar is None:
+                    continue                                  #loaded with it from the database
+                try:
+                    calendar.add(start, end, show_id)
+                except ValueError:                            #reloaded since, the show included
+                    self._venues.pop(venue_id, None)
+
+    def release(self, bookings):
+        with self.lock:
+            for booking in bookings:
+                self._held.remove(booking)
+
+    def forget(self, *venue_ids):
+        with self.lock:
+            for venue_id in venue_ids:
+                self._venues.pop(int(venue_id), None)
+
+
+def calendars():
+    """ The app's calendars """
+    return current_app.extensions['fyyur']['calendars']
+
+
+# the calendars a session's bookings were held in, by the session's info, so
+# these hooks also run outside the app context that booked them
+
+@event.listens_for(db.session, 'after_commit')
+def _committed(session):
+    for held_in, bookings in session.info.get('bookings', {}).items():
+        held_in.committed(bookings)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _transaction_end(session, transaction):
+    if transaction.parent is None:                    #committed, rolled back or closed
+        for held_in, bookings in session.info.pop('bookings', {}).items():
+            held_in.release(bookings)
+
+
+def _postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def overlaps(start, end):
+    """ Filter for shows overlapping [start, end).
+
+    On Postgres it is written the way the exclusion constraint's GiST index
+    is, so that index answers it.
+    """
+    if _postgres():
+        return func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start, end))
+    return and_(Show.start_time < end, Show.end_time > start)
+
+
+def booked(venue_id, start, end):
+    """ (start, end, show id) of the venue's shows overlapping [start, end), in time order """
+    if _postgres():
+        return [tuple(row) for row in db.session.query(
+            Show.start_time, Show.end_time, Show.id
+        ).filter(Show.venue_id == venue_id, overlaps(start, end)).order_by(Show.start_time)]
+    return calendars().get(venue_id).overlapping(start, end)
+
+
+def free_slots(bookings, start, end):
+    """ The gaps between time-ordered bookings, within [start, end) """
+    slots = []
+    cursor = start
+    for booked_start, booked_end, show_id in bookings:
+        if booked_start > cursor:
+            slots.append((cursor, min(booked_start, end)))
+        cursor = max(cursor, booked_end)
+    if cursor < end:
+        slots.append((cursor, end))
+    return slots
+
+
+def clashes(rows):
+    """ Positions of the rows (dicts with venue_id, start_time, end_time) that
+    overlap a show already booked or an earlier row, checked in one query
+    """
+    if not rows:
+        return set()
+    by_venue = defaultdict(IntervalIndex)
+    for venue_id, start, end, show_id in db.session.query(
+        Show.venue_id, Show.start_time, Show.end_time, Show.id
+    ).filter(
+        Show.venue_id.in_({row['venue_id'] for row in rows}),
+        overlaps(min(row['start_time'] for row in rows), max(row['end_time'] for row in rows)),
+    ).order_by(Show.start_time):
+        by_venue[venue_id].add(start, end, show_id)
+    found = set()
+    for position, row in enumerate(rows):
+        try:
+            by_venue[row['venue_id']].add(row['start_time'], row['end_time'], None)
+        except ValueError:
+            found.add(position)
+    return found
+
+
+def book(show):
+    """ Add and flush a show, raising DoubleBooking if its venue is taken then.
+
+    On Postgres the exclusion constraint decides, which also covers two
+    requests booking the same slot at once. Elsewhere the venue's in-process
+    calendar is checked, and the show is held until it is committed.
+    """
+    if _postgres():
+        db.session.add(show)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            if getattr(e.orig, 'pgcode', None) == EXCLUSION_VIOLATION:
+                raise DoubleBooking(show.venue_id, show.start_time, show.end_time)
+            raise
+        return show
+    venue_calendars = calendars()
+    with venue_calendars.lock:
+        if venue_calendars.taken(show.venue_id, show.start_time, show.end_time):
+            raise DoubleBooking(show.venue_id, show.start_time, show.end_time)
+        db.session.add(show)
+        db.session.flush()
+        venue_calendars.hold(db.session(), show)
+    return show
+
+
+def init_app(app):
+    app.config.setdefault('AVAILABILITY_MAX_DAYS', 90)
+    app.extensions['fyyur']['calendars'] = _Calendars()
@@ -0,0 +1,256 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, session
+from sqlalchemy import func, select
+
+from models import db
+
+
+class LocalCache(object):
+    """ Bounded in-process LRU with a per entry time to live.
+
+    It has the get/set/delete surface SharedCache expects of its client, so
+    it can also stand in for the shared store in tests.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCache(object):
+    """ Cache kept in a store shared by every worker, e.g. Redis.
+
+    client needs get(key), set(key, value, ex=seconds) and delete(*keys), so
+    one worker's invalidation is seen by all the others.
+    """
+
+    def __init__(self, client, prefix='fyyur:', ttl=300):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, value, ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+
+class NullCache(object):
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+
+class TableVersion(object):
+    """ The row count and latest updated_at of some tables, whichever process
+    wrote them: any insert, edit or delete moves it. Versions what is computed
+    from whole tables, like the facet counts.
+
+    It is read at most every LOCAL_INDEX_MAX_AGE seconds, which bounds how
+    stale the result can get.
+    """
+
+    def __init__(self, *models):
+        self.models = models
+        self.latest = None
+        self.checked_at = None
+
+    def read(self):
+        columns = []
+        for model in self.models:
+            columns.append(select(func.count(model.id)).scalar_subquery())
+            columns.append(select(func.max(model.updated_at)).scalar_subquery())
+        return tuple(db.session.execute(select(*columns)).one())
+
+    def current(self):
+        """ The version as of the last read, read again when that is older than LOCAL_INDEX_MAX_AGE """
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= current_app.config['LOCAL_INDEX_MAX_AGE']:
+            self.latest = self.read()     #before the caller's computation: a write in between only causes another one
+            self.checked_at = now
+        return self.latest
+
+
+class TableChanges(object):
+    """ Follows the writes to one table, whichever process made them (another
+    worker, `flask fyyur import`), for an in-process index to apply instead
+    of reloading.
+
+    poll() reads the row count and latest updated_at at most every
+    LOCAL_INDEX_MAX_AGE seconds. Inserts and edits are the rows updated since
+    the previous poll: at or past its updated_at, the high-water mark, less
+    those it already returned at the mark. A delete leaves no row to find: a
+    count below the previous one plus the rows created since makes the
+    caller reload everything.
+    """
+
+    def __init__(self, model, *columns):
+        self.model = model
+        self.columns = columns
+        self.count = None
+        self.high_water = None
+        self.at_mark = set()              #ids of the rows updated at the high-water mark
+        self.checked_at = None
+
+    def poll(self):
+        """ (reload, rows). reload is True on first use and after a delete, the
+        caller then loads the whole table; otherwise rows holds the columns of
+        the rows written since the last poll.
+        """
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < current_app.config['LOCAL_INDEX_MAX_AGE']:
+            return False, []
+        count, latest = db.session.execute(select(func.count(self.model.id), func.max(self.model.updated_at))).one()
+        self.checked_at = now
+        if self.count is None:
+            # the caller loads everything: rows at the mark are in it
+            self.count, self.high_water = count, latest
+            self.at_mark = {id for id, in db.session.query(self.model.id).filter(self.model.updated_at == latest)}
+            return True, []
+        if latest == self.high_water:
+            reload = count < self.count
+            self.count = count
+            return reload, []
+        query = db.session.query(self.model.id, self.model.created_at, self.model.updated_at, *self.columns)
+        if self.high_water is not None:
+            query = query.filter(self.model.updated_at >= self.high_water)   #>=: rows written in the same instant
+        found = [row for row in query if not (row[2] == self.high_water and row[0] in self.at_mark)]
+        created = sum(1 for row in found if self.high_water is None or row[1] > self.high_water)
+        reload = count < self.count + created
+        high_water = max([latest] + [row[2] for row in found])
+        at_mark = {row[0] for row in found if row[2] == high_water}
+        if high_water == self.high_water:
+            at_mark |= self.at_mark
+        self.count, self.high_water, self.at_mark = count, high_water, at_mark
+        return reload, [tuple(row[3:]) for row in found]
+
+    def forgotten(self, count=1):
+        """ Rows this process deleted and already dropped from its index, so the
+        smaller count does not cause a reload
+        """
+        if self.count is not None:
+            self.count -= count
+
+
+def create_backend(config):
+    backend = config['PAGE_CACHE_BACKEND']
+    if backend == 'local':
+        return LocalCache(config['PAGE_CACHE_MAX_ENTRIES'], config['PAGE_CACHE_TTL'])
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PAGE_CACHE_BACKEND 'redis' needs the redis package: pip install redis") from None
+        client = redis.Redis.from_url(config['PAGE_CACHE_URL'])
+        return SharedCache(client, ttl=config['PAGE_CACHE_TTL'])
+    if backend == 'null':
+        return NullCache()
+    raise ValueError('Unknown PAGE_CACHE_BACKEND {!r}'.format(backend))
+
+
+def page_key(kind, id):
+    return 'page:{}:{}'.format(kind, id)
+
+
+def get_versioned(key, version):
+    """ The cached text under key, if it was stored for this version (a line of text) """
+    value = current_app.extensions['page_cache'].get(key)
+    if value is None:
+        return None
+    stored, _, text = value.partition('\n')
+    return text if stored == version else None
+
+
+def set_versioned(key, version, text):
+    current_app.extensions['page_cache'].set(key, version + '\n' + text)
+
+
+def get_page(kind, id, etag):
+    """ The cached html of a detail page, if it was rendered for this etag.
+
+    The etag is stored with the html: once the validators move (an edit in
+    another worker's process, a show that started) the entry is stale even
+    if nothing invalidated it, and is rendered again.
+    """
+    return get_versioned(page_key(kind, id), etag)
+
+
+def set_page(kind, id, etag, html):
+    set_versioned(page_key(kind, id), etag, html)
+
+
+def cached_page(kind, id, etag, render):
+    """ Return the cached html of a detail page, rendering and storing it on a miss.
+
+    A request with flashed messages waiting is rendered fresh: the messages
+    are part of the page and must not be served to the next visitor.
+    """
+    if '_flashes' in session:
+        return render()
+    html = get_page(kind, id, etag)
+    if html is None:
+        html = render()
+        set_page(kind, id, etag, html)
+    return html
+
+
+def invalidate(kind, *ids):
+    current_app.extensions['page_cache'].delete(*[page_key(kind, id) for id in ids])
+
+
+def init_app(app, backend=None):
+    app.config.setdefault('PAGE_CACHE_BACKEND', 'local')
+    app.config.setdefault('PAGE_CACHE_URL', None)
+    app.config.setdefault('PAGE_CACHE_MAX_ENTRIES', 1024)
+    app.config.setdefault('PAGE_CACHE_TTL', 300)
+    app.config.setdefault('LOCAL_INDEX_MAX_AGE', 5)
+    app.extensions['page_cache'] = backend or create_backend(app.config)
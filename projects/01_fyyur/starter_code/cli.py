@@ -0,0 +1,14 @@
+from flask.cli import AppGroup
+
+from assets import assets_command
+from counters import reconcile_command
+from feed import feed_command
+from importer import import_command
+from recommend import recommend_command
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+fyyur_cli.add_command(assets_command)
+fyyur_cli.add_command(import_command)
+fyyur_cli.add_command(recommend_command)
+fyyur_cli.add_command(feed_command)
+fyyur_cli.add_command(reconcile_command)
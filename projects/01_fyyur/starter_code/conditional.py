@@ -0,0 +1,122 @@
+import hashlib
+from datetime import datetime, timezone
+
+from flask import abort, current_app, make_response, request, session
+from sqlalchemy import func, select
+
+from models import db, Venue, Artist, Show, Recommendation
+
+
+class Validators(object):
+    def __init__(self, parts, last_modified):
+        self.etag = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        self.last_modified = last_modified
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values).replace(microsecond=0, tzinfo=timezone.utc) if values else None
+
+
+# kind -> (model, the other side of its shows, show column pointing at the
+#          model, at the other side, recommendation column of the model)
+DETAILS = {
+    'venue': (Venue, Artist, Show.venue_id, Show.artist_id, Recommendation.venue_id),
+    'artist': (Artist, Venue, Show.artist_id, Show.venue_id, Recommendation.artist_id),
+}
+
+
+def detail_validators_statement(kind, id, now):
+    """ One aggregate over the entity, its shows and their counterparts.
+
+    updated_at moves whenever any of them is written, refreshed_at whenever
+    the suggestions shown on the page are recomputed. The number of shows
+    already started is part of the etag too, since the page splits shows into
+    past and upcoming and that changes with time alone.
+    """
+    model, other, own_key, other_key, suggestion_key = DETAILS[kind]
+    started = Show.start_time < now
+    suggested_at = select(func.max(Recommendation.refreshed_at)).where(
+        Recommendation.subject == kind, suggestion_key == id
+    ).scalar_subquery()
+    return select(
+        model.updated_at,
+        func.max(Show.updated_at),
+        func.max(other.updated_at),
+        func.count(Show.id),
+        func.count(Show.id).filter(started),
+        func.max(Show.start_time).filter(started),
+        suggested_at,
+    ).select_from(model).outerjoin(
+        Show, own_key == model.id
+    ).outerjoin(
+        other, other.id == other_key
+    ).where(model.id == id).group_by(model.id)
+
+
+def detail_validators(kind, id, row):
+    """ Validators from the row of detail_validators_statement, None if there is no such entity """
+    if row is None:
+        return None
+    updated_at, shows_updated_at, others_updated_at, shows, started_shows, last_started, suggested_at = row
+    if last_started is not None:
+        last_started = last_started.astimezone(timezone.utc).replace(tzinfo=None)   #start_time is local time
+    return Validators(
+        (kind, id, updated_at, shows_updated_at, others_updated_at, shows, started_shows, suggested_at),
+        _latest(updated_at, shows_updated_at, others_updated_at, last_started, suggested_at),
+    )
+
+
+def _detail_validators(kind, id):
+    return detail_validators(kind, id, db.session.execute(detail_validators_statement(kind, id, datetime.now())).first())
+
+
+def venue_validators(venue_id):
+    return _detail_validators('venue', venue_id)
+
+
+def artist_validators(artist_id):
+    return _detail_validators('artist', artist_id)
+
+
+def shows_validators():
+    """ /shows depends on every show, venue and artist; each max is an index lookup """
+    row = db.session.query(
+        db.session.query(func.max(Show.updated_at)).scalar_subquery(),
+        db.session.query(func.max(Venue.updated_at)).scalar_subquery(),
+        db.session.query(func.max(Artist.updated_at)).scalar_subquery(),
+    ).one()
+    return Validators(('shows', request.full_path) + tuple(row), _latest(*row))
+
+
+def is_fresh(validators):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(validators.etag)
+    if request.if_modified_since and validators.last_modified:
+        return validators.last_modified <= request.if_modified_since
+    return False
+
+
+def respond(validators, render):
+    """ Answer a GET from its validators, rendering only when the client's copy is stale.
+
+    Pages carrying flashed messages are one-offs: they are rendered and sent
+    without validators so they are never reused.
+    """
+    if validators is None:
+        abort(404)
+    if '_flashes' in session:
+        return render()
+    if is_fresh(validators):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(validators.etag, weak=True)
+    if validators.last_modified:
+        response.last_modified = validators.last_modified
+    response.headers['Cache-Control'] = current_app.config['HTTP_CACHE_CONTROL']
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('HTTP_CACHE_CONTROL', 'no-cache')
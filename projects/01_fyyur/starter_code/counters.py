@@ -0,0 +1,84 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, or_, select, update
+
+from models import db, Venue, Artist, Show
+
+# model -> the show column pointing at it
+KEYS = (
+    (Venue, Show.venue_id, 'venue_id'),
+    (Artist, Show.artist_id, 'artist_id'),
+)
+
+
+def _unchanged(model):
+    # counters are not edits: keep updated_at, and with it the http validators
+    # and the fragment cache keys that follow it
+    return {'updated_at': model.updated_at}
+
+
+def shows_added(rows, delta=1):
+    """ Count new shows (dicts or Shows with venue_id, artist_id, start_time) on
+    their venue and artist, in the caller's transaction; delta=-1 uncounts
+    deleted ones. One executemany UPDATE per model, rows locked in id order.
+    """
+    now = datetime.now()
+    for model, key, attribute in KEYS:
+        upcoming, past = Counter(), Counter()
+        for row in rows:
+            id = row[attribute] if isinstance(row, dict) else getattr(row, attribute)
+            start_time = row['start_time'] if isinstance(row, dict) else row.start_time
+            (past if start_time < now else upcoming)[id] += delta
+        ids = sorted(set(upcoming) | set(past))
+        if not ids:
+            continue
+        db.session.execute(
+            update(model).where(model.id == bindparam('counted_id')).values(
+                upcoming_shows_count=model.upcoming_shows_count + bindparam('upcoming'),
+                past_shows_count=model.past_shows_count + bindparam('past'),
+                **_unchanged(model)
+            ).execution_options(synchronize_session=False),
+            [{'counted_id': id, 'upcoming': upcoming[id], 'past': past[id]} for id in ids],
+        )
+
+
+def reconcile(since=None):
+    """ Recount from the show table the venues and artists with a show that
+    started since `since`, or every one of them when it is None.
+
+    Shows move from upcoming to past just by starting, so this runs
+    periodically with a lookback longer than its interval. Counts are
+    recomputed, not decremented, so overlapping runs are harmless.
+    Returns how many venues and artists changed.
+    """
+    now = datetime.now()
+    changed = 0
+    for model, key, attribute in KEYS:
+        # correlated subqueries rather than UPDATE ... FROM, which SQLite lacks
+        shows = select(func.count(Show.id)).where(key == model.id)
+        upcoming = shows.where(Show.start_time >= now).scalar_subquery()
+        past = shows.where(Show.start_time < now).scalar_subquery()
+        recount = update(model).where(
+            or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past),
+        )
+        if since is not None:
+            recount = recount.where(model.id.in_(select(key).where(Show.start_time >= since, Show.start_time < now)))
+        changed += db.session.execute(recount.values(
+            upcoming_shows_count=upcoming, past_shows_count=past, **_unchanged(model)
+        ).execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return changed
+
+
+@click.command('reconcile-counts')
+@click.option('--lookback', default=60, show_default=True,
+              help='Recount venues and artists with shows started in the last N minutes.')
+@click.option('--full', is_flag=True, help='Recount every venue and artist.')
+@with_appcontext
+def reconcile_command(lookback, full):
+    """ Move show counts from upcoming to past as shows start; run it every few minutes. """
+    changed = reconcile(None if full else datetime.now() - timedelta(minutes=lookback))
+    click.echo('Recounted shows, {} venues/artists changed.'.format(changed))
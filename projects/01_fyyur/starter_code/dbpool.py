@@ -0,0 +1,114 @@
+import threading
+import time
+
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+# upper bounds, in seconds, of the checkout wait histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolStats(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            for position, bound in enumerate(WAIT_BUCKETS):
+                if waited <= bound:
+                    break
+            else:
+                position = len(WAIT_BUCKETS)
+            self.wait_buckets[position] += 1
+
+
+class TimedQueuePool(QueuePool):
+    """ QueuePool that times how long each checkout waits for a free connection """
+
+    def __init__(self, *args, **kwargs):
+        super(TimedQueuePool, self).__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super(TimedQueuePool, self)._do_get()
+        except TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+def pool_metrics(engine):
+    """ Snapshot of one engine's pool, for sizing pools against the worker count """
+    pool = engine.pool
+    metrics = {"pool": pool.__class__.__name__, "status": pool.status()}
+    if not isinstance(pool, QueuePool):
+        return metrics
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    metrics.update({
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+    })
+    stats = getattr(pool, 'stats', None)
+    if stats is not None:
+        metrics.update({
+            "checkouts": stats.checkouts,
+            "checkout_timeouts": stats.timeouts,
+            "checkout_wait_seconds_total": round(stats.wait_total, 6),
+            "checkout_wait_seconds_max": round(stats.wait_max, 6),
+            "checkout_wait_seconds_buckets": dict(zip(
+                [str(bound) for bound in WAIT_BUCKETS] + ['+Inf'], stats.wait_buckets
+            )),
+        })
+    return metrics
+
+
+def engine_options(config, url):
+    """ Pool and timeout options for an engine on url, from DB_* settings """
+    options = {}
+    if make_url(url).get_backend_name() == 'sqlite':
+        return options                     #sqlite keeps SQLAlchemy's own pool choice
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    })
+    if config['DB_STATEMENT_TIMEOUT_MS'] and make_url(url).get_backend_name() == 'postgresql':
+        options['connect_args'] = {
+            'options': '-c statement_timeout={:d}'.format(config['DB_STATEMENT_TIMEOUT_MS'])
+        }
+    return options
+
+
+def init_app(app):
+    """ Fill SQLALCHEMY_ENGINE_OPTIONS before the first engine is created.
+
+    Anything already set in SQLALCHEMY_ENGINE_OPTIONS wins.
+    """
+    app.config.setdefault('DB_POOL_SIZE', 5)
+    app.config.setdefault('DB_MAX_OVERFLOW', 10)
+    app.config.setdefault('DB_POOL_TIMEOUT', 30)
+    app.config.setdefault('DB_POOL_RECYCLE', 1800)
+    app.config.setdefault('DB_POOL_PRE_PING', True)
+    app.config.setdefault('DB_STATEMENT_TIMEOUT_MS', 0)
+    options = engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI'])
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
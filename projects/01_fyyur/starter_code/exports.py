@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from models import db, Venue, Artist, Show
+
+# rows fetched per round trip from the server-side cursor, and written per chunk
+CHUNK_SIZE = 1000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _columns(model):
+    return [column for column in model.__table__.columns]
+
+
+def export_query(kind, start=None, end=None):
+    """ Column-only query for one export, in primary key order """
+    if kind == 'shows':
+        columns = _columns(Show) + [
+            Venue.name.label('venue_name'),
+            Artist.name.label('artist_name'),
+        ]
+        query = db.session.query(*columns).join(
+            Venue, Venue.id == Show.venue_id
+        ).join(
+            Artist, Artist.id == Show.artist_id
+        )
+        if start is not None:
+            query = query.filter(Show.start_time >= start)
+        if end is not None:
+            query = query.filter(Show.start_time < end)
+        return query.order_by(Show.id)
+    model = {'venues': Venue, 'artists': Artist}[kind]
+    return db.session.query(*_columns(model)).order_by(model.id)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ','.join(value)                                           #same shape the importer reads
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    return value
+
+
+def stream_rows(query, format):
+    """ Yield the export in chunks while rows stream from a server-side cursor.
+
+    yield_per keeps at most CHUNK_SIZE rows in memory on both the database
+    driver and the Python side, however large the table is.
+    """
+    rows = query.yield_per(CHUNK_SIZE)
+    keys = [column['name'] for column in query.column_descriptions]
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(keys)
+    pending = 0
+    for row in rows:
+        if format == 'csv':
+            writer.writerow([_csv_value(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(keys, row)), default=_default))
+            buffer.write('\n')
+        pending += 1
+        if pending == CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
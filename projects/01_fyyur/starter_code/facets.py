@@ -0,0 +1,156 @@
+import json
+
+from flask import current_app, request, url_for
+from sqlalchemy import String, cast, distinct, func, true, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+
+import cache
+from models import db, Venue, Artist
+
+TRUE_VALUES = ('1', 't', 'true', 'y', 'yes', 'on')
+
+# model -> its seeking flag, filtered as ?seeking_talent=1 / ?seeking_venue=1
+SEEKING = {
+    Venue: 'seeking_talent',
+    Artist: 'seeking_venue',
+}
+
+# query args that hold a list of values
+MULTI_VALUED = ('genre',)
+
+
+
+def parse_filters(args, model):
+    """ ?genre=Jazz&genre=Blues&city=San Francisco&state=CA&seeking_talent=1 -> dict """
+    seeking = SEEKING[model]
+    filters = {
+        "genre": [genre for genre in args.getlist('genre') if genre],
+        "city": args.get('city') or None,
+        "state": args.get('state') or None,
+        seeking: None,
+    }
+    if args.get(seeking):
+        filters[seeking] = args.get(seeking).lower() in TRUE_VALUES
+    return filters
+
+
+def filtered(model, filters):
+    """ Empty query over model restricted by filters, for queries.*_page to add columns to.
+
+    genres @> ARRAY[...] is answered from the GIN index on genres, and the
+    seeking flag from the partial index that also keeps the listing order.
+    Elsewhere genres is a JSON list, matched by each genre's quoted text.
+    """
+    query = db.session.query().select_from(model)
+    if filters["genre"] and db.engine.dialect.name == 'postgresql':
+        query = query.filter(model.genres.op('@>')(cast(filters["genre"], ARRAY(String))))
+    elif filters["genre"]:
+        for genre in filters["genre"]:
+            query = query.filter(cast(model.genres, String).contains(json.dumps(genre), autoescape=True))
+    if filters["city"]:
+        query = query.filter(model.city == filters["city"])
+    if filters["state"]:
+        query = query.filter(model.state == filters["state"])
+    seeking = SEEKING[model]
+    if filters[seeking] is not None:
+        query = query.filter(getattr(model, seeking) == filters[seeking])
+    return query
+
+
+def facet_counts(model, filters):
+    """ How many of the filtered rows have each genre and are in each city.
+
+    Counts are kept in the page cache per filters, under the table's row
+    count and latest updated_at: they are recomputed after a write, seen
+    within LOCAL_INDEX_MAX_AGE, not on every listing request.
+    """
+    key = 'facets:{}:{}'.format(model.__tablename__, json.dumps(filters, sort_keys=True))
+    version = json.dumps(current_app.extensions['fyyur']['facet_tables'][model].current(), default=str)
+    counts = cache.get_versioned(key, version)
+    if counts is not None:
+        return json.loads(counts)
+    if db.engine.dialect.name == 'postgresql':
+        counts = _facet_counts(model, filters)
+    else:
+        counts = _fallback_facet_counts(model, filters)
+    cache.set_versioned(key, version, json.dumps(counts))
+    return counts
+
+
+def _facet_counts(model, filters):
+    """ Both counts come from a single GROUPING SETS aggregate. The lateral
+    unnest is an outer join, so rows without genres still count towards their city.
+    """
+    genres = func.unnest(model.genres).table_valued('genre').render_derived().lateral('genres')
+    by_city = func.grouping(genres.c.genre).label('by_city')
+    rows = filtered(model, filters).add_columns(
+        genres.c.genre, model.city, model.state, func.count(distinct(model.id)).label('count'), by_city,
+    ).outerjoin(
+        genres, true()
+    ).group_by(
+        func.grouping_sets(tuple_(genres.c.genre), tuple_(model.city, model.state))
+    ).all()
+    counts = {"genres": [], "areas": []}
+    for row in rows:
+        if row.by_city:
+            counts["areas"].append((row.city, row.state, row.count))
+        elif row.genre is not None:
+            counts["genres"].append((row.genre, row.count))
+    return _sorted(counts)
+
+
+def _fallback_facet_counts(model, filters):
+    """ Without GROUPING SETS: one GROUP BY per facet, the genres from
+    SQLite's json_each over the JSON list.
+    """
+    genres = func.json_each(model.genres).table_valued('value').alias('genres')
+    by_genre = filtered(model, filters).add_columns(
+        genres.c.value, func.count(distinct(model.id))
+    ).join(genres, true()).group_by(genres.c.value)
+    by_city = filtered(model, filters).add_columns(
+        model.city, model.state, func.count(model.id)
+    ).group_by(model.city, model.state)
+    return _sorted({
+        "genres": [(genre, count) for genre, count in by_genre],
+        "areas": [(city, state, count) for city, state, count in by_city],
+    })
+
+
+def _sorted(counts):
+    counts["genres"].sort(key=lambda genre: (-genre[1], genre[0]))
+    counts["areas"].sort(key=lambda area: (-area[2], area[1], area[0]))
+    return counts
+
+
+def facet_url(**changes):
+    """ url of the current listing with filters toggled, from the first page.
+
+    A value already selected is removed, anything else is added (genre)
+    or replaces the current value.
+    """
+    args = request.args.to_dict(flat=False)
+    args.pop('after', None)
+    args.pop('before', None)
+    selected = all(value in args.get(name, ()) for name, value in changes.items())
+    for name, value in changes.items():
+        values = args.get(name, [])
+        if selected:
+            values = [current for current in values if current != value]
+        elif name in MULTI_VALUED:
+            values = values + [value]
+        else:
+            values = [value]
+        if values:
+            args[name] = values
+        else:
+            args.pop(name, None)
+    return url_for(request.endpoint, **dict(request.view_args or {}, **args))
+
+
+def init_app(app):
+    app.jinja_env.globals['facet_url'] = facet_url
+    # versions of the tables the cached counts were computed from
+    app.extensions['fyyur']['facet_tables'] = {
+        Venue: cache.TableVersion(Venue),
+        Artist: cache.TableVersion(Artist),
+    }
@@ -0,0 +1,133 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Integer, literal, or_, select, tuple_, update
+
+from models import db, Venue, Artist, Show, FeedItem
+
+RECENT = 'recent'
+UPCOMING = 'upcoming'
+
+COLUMNS = ['kind', 'item_id', 'section', 'at', 'title', 'subtitle', 'image_link', 'venue_id', 'artist_id']
+
+# newest listings first, soonest shows first
+ORDER = {
+    RECENT: FeedItem.at.desc(),
+    UPCOMING: FeedItem.at,
+}
+
+
+def _listings(model, kind):
+    return select(
+        literal(kind), model.id, literal(RECENT), model.created_at,
+        model.name, model.city + ', ' + model.state, model.image_link, literal(None, Integer), literal(None, Integer),
+    )
+
+
+def _shows(now):
+    return select(
+        literal('show'), Show.id, literal(UPCOMING), Show.start_time,
+        Artist.name, Venue.name, Artist.image_link, Show.venue_id, Show.artist_id,
+    ).join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id).where(Show.start_time > now)
+
+
+def _insert(query):
+    db.session.execute(FeedItem.__table__.insert().from_select(COLUMNS, query))
+
+
+def _trim(section, now):
+    """ Drop all but the FEED_SIZE first items of a section, and shows that have started """
+    keep = db.session.query(FeedItem.kind, FeedItem.item_id).filter(FeedItem.section == section)
+    if section == UPCOMING:
+        keep = keep.filter(FeedItem.at > now)
+    keep = keep.order_by(ORDER[section]).limit(current_app.config['FEED_SIZE']).subquery()
+    db.session.query(FeedItem).filter(
+        FeedItem.section == section,
+        tuple_(FeedItem.kind, FeedItem.item_id).notin_(select(keep.c.kind, keep.c.item_id)),
+    ).delete(synchronize_session=False)
+
+
+def listed(kind, ids):
+    """ New venues ('venue') or artists ('artist'), flushed but not committed yet,
+    so the feed changes in the same transaction
+    """
+    if not ids:
+        return
+    model = Venue if kind == 'venue' else Artist
+    _insert(_listings(model, kind).where(model.id.in_(ids)))
+    _trim(RECENT, datetime.now())
+
+
+def booked(ids):
+    """ New shows, flushed but not committed yet; only upcoming ones can make it in """
+    if not ids:
+        return
+    now = datetime.now()
+    _insert(_shows(now).where(Show.id.in_(ids)))
+    _trim(UPCOMING, now)
+
+
+def edited(kind, id):
+    """ Copy an edited (and flushed) venue's or artist's new name and picture
+    into its listing and the shows it plays a part in
+    """
+    model = Venue if kind == 'venue' else Artist
+    current = lambda column: select(column).where(model.id == id).scalar_subquery()
+    db.session.execute(update(FeedItem).where(FeedItem.kind == kind, FeedItem.item_id == id).values(
+        title=current(model.name),
+        subtitle=current(model.city + ', ' + model.state),
+        image_link=current(model.image_link),
+    ).execution_options(synchronize_session=False))
+    if kind == 'venue':
+        shows = update(FeedItem).where(FeedItem.venue_id == id).values(subtitle=current(Venue.name))
+    else:
+        shows = update(FeedItem).where(FeedItem.artist_id == id).values(
+            title=current(Artist.name), image_link=current(Artist.image_link),
+        )
+    db.session.execute(shows.execution_options(synchronize_session=False))
+
+
+def forget(kind, id):
+    db.session.query(FeedItem).filter(FeedItem.kind == kind, FeedItem.item_id == id).delete(synchronize_session=False)
+
+
+def rebuild():
+    """ Refill the feed from the source tables, dropping shows that have started.
+
+    Writes keep it current otherwise, so this only has to run about as often
+    as a show starts; each section is a top-N read of an index or a small sort.
+    """
+    now = datetime.now()
+    size = current_app.config['FEED_SIZE']
+    db.session.query(FeedItem).delete(synchronize_session=False)
+    for model, kind in ((Venue, 'venue'), (Artist, 'artist')):
+        _insert(_listings(model, kind).order_by(model.created_at.desc()).limit(size))
+    _trim(RECENT, now)
+    _insert(_shows(now).order_by(Show.start_time).limit(size))
+    db.session.commit()
+
+
+def items():
+    """ {'recent': [...], 'upcoming': [...]}, both sections in one indexed read """
+    now = datetime.now()
+    sections = {RECENT: [], UPCOMING: []}
+    for item in db.session.query(FeedItem).filter(
+        or_(FeedItem.section == RECENT, FeedItem.at > now)
+    ).order_by(FeedItem.section, FeedItem.at):
+        sections[item.section].append(item)
+    sections[RECENT].reverse()
+    return sections
+
+
+@click.command('feed')
+@with_appcontext
+def feed_command():
+    """ Rebuild the home page feed; run it periodically, e.g. from cron every few minutes. """
+    rebuild()
+    click.echo('Home feed rebuilt.')
+
+
+def init_app(app):
+    app.config.setdefault('FEED_SIZE', 6)
@@ -0,0 +1,73 @@
+import re
+from datetime import date, datetime, time, timezone
+from functools import lru_cache
+
+NAMED_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def _locale(name):
+    from babel import Locale               #loaded with the first formatted date, not at startup
+    return Locale.parse(name)
+
+
+# babel's own named formats, resolved per locale
+BABEL_FORMATS = ('full', 'long', 'medium', 'short')
+
+
+@lru_cache(maxsize=256)
+def _pattern(format, locale):
+    """ Compiled babel pattern, parsed once per format string and locale """
+    from babel.dates import parse_pattern
+    format = NAMED_FORMATS.get(format, format)
+    if format in BABEL_FORMATS:
+        format = _named_pattern(format, _locale(locale))
+    return parse_pattern(format)
+
+
+def _named_pattern(format, locale):
+    # babel.dates.format_datetime fills the locale's datetime format, quotes
+    # dropped, with the date and time formats: the same as one pattern, its
+    # literal text quoted
+    from babel.dates import get_date_format, get_datetime_format, get_time_format
+    patterns = {
+        '{0}': get_time_format(format, locale).pattern,
+        '{1}': get_date_format(format, locale).pattern,
+    }
+    parts = re.split(r'(\{[01]\})', get_datetime_format(format, locale).replace("'", ""))
+    return ''.join(patterns.get(part) or "'{}'".format(part) for part in parts if part)
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time())
+    import dateutil.parser                 #only strings need it, keep it off the import path
+    return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    """ Same output as babel.dates.format_datetime(value, format, locale),
+    without re-parsing the pattern and locale on every call.
+
+    datetimes are used as they are, strings are still parsed for old callers.
+    """
+    value = _to_datetime(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)     #what babel does with naive values
+    return _pattern(format, locale).apply(value, _locale(locale))
+
+
+def memoized(size):
+    """ format_datetime with the last size results kept, for pages that repeat the same times """
+    return lru_cache(maxsize=size)(format_datetime)
+
+
+def init_app(app):
+    app.config.setdefault('DATETIME_FORMAT_CACHE_SIZE', 4096)
+    size = app.config['DATETIME_FORMAT_CACHE_SIZE']
+    app.jinja_env.filters['datetime'] = memoized(size) if size else format_datetime
@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, FloatField
+from wtforms.validators import DataRequired, InputRequired, AnyOf, URL, NumberRange, Optional
 import re
 
 def is_valid_phone(number):
@@ -19,6 +19,26 @@ def is_valid_phone(number):
     regex = re.compile('^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$')
     return regex.match(number)
 
+class MultiFormatDateTimeField(DateTimeField):
+    """ DateTimeField parsing the first of a list of formats that matches,
+    as WTForms 3 does; the 2.x field takes a single format.
+    """
+    def __init__(self, label=None, validators=None, format=('%Y-%m-%d %H:%M:%S',), **kwargs):
+        super(MultiFormatDateTimeField, self).__init__(label, validators, format=format[0], **kwargs)
+        self.formats = format
+
+    def process_formdata(self, valuelist):
+        if valuelist:
+            date_str = ' '.join(valuelist)
+            for format in self.formats:
+                try:
+                    self.data = datetime.strptime(date_str, format)
+                    return
+                except ValueError:
+                    pass
+            self.data = None
+            raise ValueError(self.gettext('Not a valid datetime value'))
+
 class ShowForm(FlaskForm):
     artist_id = StringField(
         'artist_id'
@@ -26,11 +46,19 @@ class ShowForm(FlaskForm):
     venue_id = StringField(
         'venue_id'
     )
-    start_time = DateTimeField(
+    start_time = MultiFormatDateTimeField(
+        # InputRequired: a value that does not parse reports why, not "This field is required."
         'start_time',
-        validators=[DataRequired()],
+        validators=[InputRequired()],
+        format=['%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'],
         default= datetime.today()
     )
+    duration = IntegerField(
+        # minutes the venue is booked for, from start_time
+        'duration',
+        validators=[DataRequired(), NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
 
 class VenueForm(FlaskForm):
     name = StringField(
@@ -142,6 +170,13 @@ class VenueForm(FlaskForm):
         'seeking_description'
     )
 
+    latitude = FloatField(
+        'latitude', validators=[Optional(), NumberRange(min=-90, max=90)]
+    )
+    longitude = FloatField(
+        'longitude', validators=[Optional(), NumberRange(min=-180, max=180)]
+    )
+
     def validate(self):
         rv = FlaskForm.validate(self)
         if not rv:
@@ -149,12 +184,15 @@ class VenueForm(FlaskForm):
         if not is_valid_phone(self.phone.data):
             self.phone.errors.append('Invalid phone.')
             return False
-        if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
+        if not set(self.genres.data).issubset(dict(self.genres.choices).keys()):
             self.genres.errors.append('Invalid genres.')
             return False
-        if self.state.data not in dict(State.choices()).keys():
+        if self.state.data not in dict(self.state.choices).keys():
             self.state.errors.append('Invalid state.')
             return False
+        if (self.latitude.data is None) != (self.longitude.data is None):
+            self.longitude.errors.append('Enter both latitude and longitude, or neither.')
+            return False
         # if pass validation
         return True
 
@@ -276,10 +314,10 @@ class ArtistForm(FlaskForm):
         if not is_valid_phone(self.phone.data):
             self.phone.errors.append('Invalid phone.')
             return False
-        if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
+        if not set(self.genres.data).issubset(dict(self.genres.choices).keys()):
             self.genres.errors.append('Invalid genres.')
             return False
-        if self.state.data not in dict(State.choices()).keys():
+        if self.state.data not in dict(self.state.choices).keys():
             self.state.errors.append('Invalid state.')
             return False
         # if pass validation
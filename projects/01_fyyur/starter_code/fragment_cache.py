@@ -0,0 +1,47 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import LocalCache
+
+
+class FragmentCacheExtension(Extension):
+    """ {% cache 'show-tile', show.id, show.updated_at %} ... {% endcache %}
+
+    The block renders once per key and is reused by every page and request
+    that asks for the same key. Keys name the fragment, the entity id and
+    its updated_at, so an edit moves to a new key instead of needing an
+    invalidation; old keys fall out of the bounded LRU.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super(FragmentCacheExtension, self).__init__(environment)
+        environment.extend(fragment_cache=None)            #the store, set by init_app
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        key = 'fragment:' + ':'.join(str(part) for part in parts)
+        store = self.environment.fragment_cache
+        html = store.get(key)
+        if html is None:
+            html = caller()
+            store.set(key, html)
+        return Markup(html) if self.environment.autoescape else html
+
+
+def init_app(app):
+    app.config.setdefault('FRAGMENT_CACHE_MAX_ENTRIES', 4096)
+    app.config.setdefault('FRAGMENT_CACHE_TTL', 0)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    store = LocalCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'], app.config['FRAGMENT_CACHE_TTL'])
+    app.jinja_env.fragment_cache = app.extensions['fyyur']['fragment_cache'] = store
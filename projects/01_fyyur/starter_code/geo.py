@@ -0,0 +1,216 @@
+import heapq
+import math
+import threading
+
+from flask import current_app
+from sqlalchemy import func
+
+import cache
+from models import db, Venue
+
+# same sphere as earthdistance's earth(), so both backends agree on distances
+EARTH_RADIUS_KM = 6378.168
+
+# grid cell edge, in degrees of latitude/longitude
+CELL_DEGREES = 0.25
+# cells around the globe, columns wrap at the antimeridian
+COLUMNS = int(360 / CELL_DEGREES)
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """ Great-circle (haversine) distance """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _row(lat):
+    return int(math.floor(lat / CELL_DEGREES))
+
+
+def _column(lng):
+    return int(math.floor((lng + 180.0) / CELL_DEGREES)) % COLUMNS
+
+
+class GridIndex(object):
+    """ Venue coordinates bucketed into CELL_DEGREES square cells.
+
+    A radius search only visits the cells under the circle's bounding box.
+    A nearest-N search walks rings of cells outwards until it has N venues,
+    then settles the order with a radius search out to the furthest of them.
+    Either way the work follows the venues near the point, not how many
+    venues there are.
+    """
+
+    def __init__(self):
+        self._cells = {}
+        self._points = {}                 #venue id -> (lat, lng)
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def add(self, id, lat, lng):
+        with self._lock:
+            self.remove(id)
+            if lat is None or lng is None:
+                return
+            self._points[id] = (lat, lng)
+            self._cells.setdefault((_row(lat), _column(lng)), set()).add(id)
+
+    def remove(self, id):
+        with self._lock:
+            point = self._points.pop(id, None)
+            if point is not None:
+                cell = (_row(point[0]), _column(point[1]))
+                self._cells[cell].discard(id)
+                if not self._cells[cell]:
+                    del self._cells[cell]
+
+    def load(self, records):
+        with self._lock:
+            self._cells = {}
+            self._points = {}
+            for id, lat, lng in records:
+                self.add(id, lat, lng)
+            self.loaded = True
+
+    def _candidates(self, cells, lat, lng):
+        for cell in cells:
+            for id in self._cells.get(cell, ()):
+                yield distance_km(lat, lng, *self._points[id]), id
+
+    def within(self, lat, lng, radius_km, limit):
+        """ (distance, id) of venues within radius_km, nearest first """
+        angle = radius_km / EARTH_RADIUS_KM
+        lat_span = math.degrees(angle)
+        if abs(lat) + lat_span >= 90.0 or angle >= math.pi / 2:
+            columns = range(COLUMNS)                                  #the circle reaches a pole
+        else:
+            lng_span = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+            first, last = int(math.floor((lng - lng_span + 180.0) / CELL_DEGREES)), int(math.floor((lng + lng_span + 180.0) / CELL_DEGREES))
+            columns = {column % COLUMNS for column in range(first, last + 1)}
+        rows = range(_row(max(lat - lat_span, -90.0)), _row(min(lat + lat_span, 90.0)) + 1)
+        with self._lock:
+            found = [(distance, id) for distance, id in self._candidates(
+                ((row, column) for row in rows for column in columns), lat, lng
+            ) if distance <= radius_km]
+        return heapq.nsmallest(limit, found)
+
+    def _ring(self, row, column, radius):
+        """ cells exactly `radius` steps away from (row, column) """
+        if radius == 0:
+            yield row, column
+            return
+        for step in range(-radius, radius + 1):
+            yield row - radius, (column + step) % COLUMNS
+            yield row + radius, (column + step) % COLUMNS
+        for step in range(-radius + 1, radius):
+            yield row + step, (column - radius) % COLUMNS
+            yield row + step, (column + radius) % COLUMNS
+
+    def nearest(self, lat, lng, limit):
+        """ (distance, id) of the `limit` venues closest to the point """
+        with self._lock:
+            wanted = min(limit, len(self._points))
+            if not wanted:
+                return []
+            found = {}
+            radius = 0
+            while len(found) < wanted:
+                for distance, id in self._candidates(self._ring(_row(lat), _column(lng), radius), lat, lng):
+                    found[id] = distance
+                radius += 1
+            # nothing outside the rings walked can be closer than the furthest of
+            # the `wanted` nearest inside them
+            cutoff = heapq.nsmallest(wanted, found.values())[-1]
+            return self.within(lat, lng, cutoff, wanted)
+
+
+def _state():
+    return current_app.extensions['fyyur']
+
+
+def ensure_loaded():
+    """ The app's grid. Venues written by other processes are moved into
+    place within LOCAL_INDEX_MAX_AGE; only a delete elsewhere reloads it.
+    """
+    index = _state()['geo']
+    reload, rows = _state()['geo_changes'].poll()
+    if reload or not index.loaded:
+        index.load(db.session.query(Venue.id, Venue.latitude, Venue.longitude).filter(Venue.latitude.isnot(None)))
+    else:
+        for id, lat, lng in rows:
+            index.add(id, lat, lng)                   #without coordinates: removed
+    return index
+
+
+def record_venue(venue):
+    record_points([(venue.id, venue.latitude, venue.longitude)])
+
+
+def record_points(records):
+    """ record_venue for many (id, lat, lng) at once """
+    index = _state()['geo']
+    if index.loaded:
+        for id, lat, lng in records:
+            index.add(id, lat, lng)
+
+
+def forget_venue(venue_id):
+    index = _state()['geo']
+    if index.loaded:
+        index.remove(int(venue_id))
+        _state()['geo_changes'].forgotten()
+
+
+def reset():
+    """ Reload on next use, after writes that bypassed record_venue """
+    _state()['geo'].loaded = False
+
+
+def _postgres_search(lat, lng, radius_km, limit):
+    """ earthdistance over the GiST index on ll_to_earth(latitude, longitude).
+
+    A radius is an earth_box containment (an index range scan) refined by the
+    exact distance; nearest-N is a KNN scan ordered by <->, which for points
+    on the sphere sorts the same way as the great-circle distance.
+    """
+    here = func.ll_to_earth(lat, lng)
+    there = func.ll_to_earth(Venue.latitude, Venue.longitude)
+    distance = func.earth_distance(here, there)
+    query = db.session.query(Venue.id, (distance / 1000.0).label('distance_km')).filter(Venue.latitude.isnot(None))
+    if radius_km is not None:
+        query = query.filter(
+            func.earth_box(here, radius_km * 1000.0).op('@>')(there),
+            distance <= radius_km * 1000.0,
+        ).order_by(distance)
+    else:
+        query = query.order_by(there.op('<->')(here))
+    return [(distance_km, id) for id, distance_km in query.limit(limit)]
+
+
+def _fallback_search(lat, lng, radius_km, limit):
+    if radius_km is not None:
+        return ensure_loaded().within(lat, lng, radius_km, limit)
+    return ensure_loaded().nearest(lat, lng, limit)
+
+
+def near(lat, lng, radius_km=None, limit=20):
+    """ Venues nearest (lat, lng) first, as dicts with their distance_km.
+
+    With radius_km, only venues that close; without it, the `limit` nearest.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        found = _postgres_search(lat, lng, radius_km, limit)
+    else:
+        found = _fallback_search(lat, lng, radius_km, limit)
+    if not found:
+        return []
+    venues = {row.id: row for row in db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude
+    ).filter(Venue.id.in_([id for distance, id in found]))}
+    return [dict(venues[id]._mapping, distance_km=round(distance, 3)) for distance, id in found if id in venues]
+
+
+def init_app(app):
+    app.extensions['fyyur']['geo'] = GridIndex()
+    app.extensions['fyyur']['geo_changes'] = cache.TableChanges(Venue, Venue.id, Venue.latitude, Venue.longitude)
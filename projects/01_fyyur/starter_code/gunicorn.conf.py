@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+# `gunicorn` from starter_code/ reads this file
+wsgi_app = 'wsgi:application'
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# build the app once in the master: workers fork ready to serve, share its
+# memory pages and its SECRET_KEY; wsgi.py gives each one its own connections
+preload_app = True
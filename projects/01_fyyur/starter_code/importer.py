@@ -0,0 +1,270 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+import bookings
+import cache
+import counters
+import feed
+import geo
+import recommend
+from models import db, Venue, Artist, Show
+
+FALSE_VALUES = ('', '0', 'f', 'false', 'n', 'no', 'off')
+
+# kind -> (model, form class in forms.py, columns written, form field feeding each column)
+KINDS = {
+    'venues': (Venue, 'VenueForm', {
+        'name': 'name', 'city': 'city', 'state': 'state', 'address': 'address',
+        'phone': 'phone', 'image_link': 'image_link', 'facebook_link': 'facebook_link',
+        'genres': 'genres', 'website': 'website_link', 'seeking_talent': 'seeking_talent',
+        'seeking_description': 'seeking_description', 'latitude': 'latitude', 'longitude': 'longitude',
+    }),
+    'artists': (Artist, 'ArtistForm', {
+        'name': 'name', 'city': 'city', 'state': 'state', 'phone': 'phone',
+        'genres': 'genres', 'image_link': 'image_link', 'facebook_link': 'facebook_link',
+        'website_link': 'website_link', 'seeking_venue': 'seeking_venue',
+        'seeking_description': 'seeking_description',
+    }),
+    'shows': (Show, 'ShowForm', {
+        'start_time': 'start_time', 'venue_id': 'venue_id', 'artist_id': 'artist_id',
+        'end_time': 'duration',                                           #minutes, turned into end_time below
+    }),
+}
+
+
+def form_class(kind):
+    import forms                                                          #wtforms loads with the first import, not at startup
+    return getattr(forms, KINDS[kind][1])
+
+
+def read_records(stream, format):
+    """ Yield (line number, dict) pairs one at a time, never the whole file """
+    if format == 'csv':
+        for number, record in enumerate(csv.DictReader(stream), 2):        #line 1 is the header
+            yield number, record
+    else:
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+
+def to_formdata(record):
+    """ Flatten a csv/ndjson record into what the form would get from a browser """
+    formdata = MultiDict()
+    for key, value in record.items():
+        if key is None or value is None:
+            continue
+        if key in ('seeking_talent', 'seeking_venue'):
+            if str(value).strip().lower() not in FALSE_VALUES:
+                formdata.add(key, 'y')
+        elif key == 'genres':
+            genres = value if isinstance(value, list) else str(value).split(',')
+            for genre in genres:
+                if genre.strip():
+                    formdata.add(key, genre.strip())
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+def _copy_value(value):
+    """ One field of COPY ... FROM STDIN in text format """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        value = '{' + ','.join(
+            '"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value
+        ) + '}'
+    elif isinstance(value, datetime):
+        value = value.isoformat(' ')
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def write_batch(model, columns, rows):
+    """ COPY the batch on Postgres, one executemany insert elsewhere """
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_value(row[column]) for column in columns))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert('COPY "{}" ({}) FROM STDIN'.format(
+            model.__tablename__, ', '.join('"{}"'.format(column) for column in columns)
+        ), buffer)
+    else:
+        connection.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+
+def _missing_references(rows):
+    """ ids of venues/artists a batch of shows points at that do not exist """
+    venue_ids = {row['venue_id'] for row in rows}
+    artist_ids = {row['artist_id'] for row in rows}
+    known_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    known_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    return venue_ids - known_venues, artist_ids - known_artists
+
+
+def validate_record(kind, form, record):
+    """ (row of column values, None) for a valid record, (None, errors) otherwise.
+
+    form is reused between records, building one per record costs more
+    than validating it.
+    """
+    if not isinstance(record, dict):
+        return None, {'record': ['Not a JSON object.']}
+    form.process(to_formdata(record))
+    if not form.validate():
+        return None, dict(form.errors)
+    row = {column: form[field].data for column, field in KINDS[kind][2].items()}
+    if kind == 'shows':
+        try:
+            row['venue_id'] = int(row['venue_id'])
+            row['artist_id'] = int(row['artist_id'])
+            row['end_time'] = bookings.end_time(row['start_time'], row['end_time'])
+        except (TypeError, ValueError):
+            return None, {'venue_id/artist_id': ['Not a valid id.']}
+    return row, None
+
+
+def check_shows(batch):
+    """ Split (key, row) pairs of shows into the insertable ones and (key, errors)
+    for those pointing at a missing venue/artist or double-booking a venue
+    """
+    missing_venues, missing_artists = _missing_references([row for key, row in batch])
+    rejected = []
+    known = []
+    for key, row in batch:
+        errors = {}
+        if row['venue_id'] in missing_venues:
+            errors['venue_id'] = ['No such venue.']
+        if row['artist_id'] in missing_artists:
+            errors['artist_id'] = ['No such artist.']
+        if errors:
+            rejected.append((key, errors))
+        else:
+            known.append((key, row))
+    double_booked = bookings.clashes([row for key, row in known])
+    for position in sorted(double_booked):
+        key, row = known[position]
+        rejected.append((key, {'start_time': [str(bookings.DoubleBooking(
+            row['venue_id'], row['start_time'], row['end_time']
+        ))]}))
+    valid = [(key, row) for position, (key, row) in enumerate(known) if position not in double_booked]
+    return valid, rejected
+
+
+def shows_written(rows):
+    """ Drop what caches the pages and calendars of the venues/artists of new shows.
+
+    That only reaches this process. Other processes, e.g. web workers after
+    `flask fyyur import`, see the new rows through the etags of their cached
+    pages and the table versions of their in-process indexes.
+    """
+    venue_ids = {row['venue_id'] for row in rows}
+    bookings.calendars().forget(*venue_ids)
+    cache.invalidate('venue', *venue_ids)
+    cache.invalidate('artist', *{row['artist_id'] for row in rows})
+
+
+def import_records(kind, records, batch_size=5000, on_reject=None, on_batch=None):
+    """ Validate records with the kind's form and write the valid ones in batches.
+
+    Only one batch is held in memory. Returns (imported, rejected).
+    """
+    model, form_name, fields = KINDS[kind]
+    columns = list(fields)
+    form = form_class(kind)(meta={'csrf': False})
+    imported = rejected = 0
+    batch = []
+
+    def flush():
+        nonlocal imported, rejected
+        if kind == 'shows':
+            valid, rejects = check_shows(batch)
+            for number, errors in sorted(rejects):
+                if on_reject:
+                    on_reject(number, errors)
+            valid = [row for number, row in valid]
+            rejected += len(rejects)
+        else:
+            valid = [row for number, row in batch]
+        if valid:
+            if kind == 'shows':
+                counters.shows_added(valid)                               #committed by write_batch with the rows
+            write_batch(model, columns, valid)
+            imported += len(valid)
+        if kind == 'shows':
+            shows_written(valid)
+        elif kind == 'venues' and valid:
+            geo.reset()                                                   #COPY bypassed geo.record_venue
+        del batch[:]
+        if on_batch:
+            on_batch(imported, rejected)
+
+    for number, record in records:
+        row, errors = validate_record(kind, form, record)
+        if errors:
+            rejected += 1
+            if on_reject:
+                on_reject(number, errors)
+            continue
+        batch.append((number, row))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    if imported:
+        feed.rebuild()
+    if kind != 'shows' and imported and recommend.available():
+        recommend.refresh_all()                                           #cheaper than one refresh per imported row
+    return imported, rejected
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to the extension of SOURCE.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per COPY/insert and commit.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+              help='Write rejected rows and their errors here as ndjson.')
+@with_appcontext
+def import_command(kind, source, format, batch_size, rejects):
+    """ Stream venues, artists or shows from a csv or ndjson file. """
+    if format is None:
+        format = 'csv' if source.name.endswith('.csv') else 'ndjson'
+    started = time.monotonic()
+
+    def on_reject(number, errors):
+        if rejects:
+            rejects.write(json.dumps({'line': number, 'errors': errors}) + '\n')
+
+    def on_batch(imported, rejected):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        click.echo('{} imported, {} rejected, {:.0f} rows/s'.format(
+            imported, rejected, (imported + rejected) / elapsed
+        ), err=True)
+
+    imported, rejected = import_records(kind, read_records(source, format), batch_size, on_reject, on_batch)
+    elapsed = max(time.monotonic() - started, 1e-6)
+    click.echo('Imported {} {} in {:.1f}s ({:.0f} rows/s), rejected {}.'.format(
+        imported, kind, elapsed, imported / elapsed, rejected
+    ))
+    if rejected and not rejects:
+        click.echo('Rerun with --rejects FILE to see why rows were rejected.', err=True)
@@ -73,6 +73,11 @@ def run_migrations_online():
     connectable = current_app.extensions['migrate'].db.engine
 
     with connectable.connect() as connection:
+        # the app's DB_STATEMENT_TIMEOUT_MS is meant for requests, index
+        # builds on big tables must be allowed to run to completion
+        if connection.dialect.name == 'postgresql':
+            connection.execute('SET statement_timeout = 0')
+
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
@@ -0,0 +1,37 @@
+"""upcoming and past show counters on venue and artist
+
+Revision ID: 0d6c9e4a7b13
+Revises: f3a7d1c9b520
+Create Date: 2026-10-18 18:20:47.631058
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d6c9e4a7b13'
+down_revision = 'f3a7d1c9b520'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        # start_time is local time, hence LOCALTIMESTAMP
+        op.execute(
+            'UPDATE {0} SET upcoming_shows_count = counts.upcoming, past_shows_count = counts.past '
+            'FROM (SELECT {0}_id AS id, '
+            'count(*) FILTER (WHERE start_time >= LOCALTIMESTAMP) AS upcoming, '
+            'count(*) FILTER (WHERE start_time < LOCALTIMESTAMP) AS past '
+            'FROM show GROUP BY {0}_id) AS counts '
+            'WHERE {0}.id = counts.id'.format(table)
+        )
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
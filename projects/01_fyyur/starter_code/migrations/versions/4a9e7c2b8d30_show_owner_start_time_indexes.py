@@ -0,0 +1,26 @@
+"""show owner start_time indexes
+
+Revision ID: 4a9e7c2b8d30
+Revises: d47a0c3e9f15
+Create Date: 2026-10-18 12:41:52.309118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a9e7c2b8d30'
+down_revision = 'd47a0c3e9f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
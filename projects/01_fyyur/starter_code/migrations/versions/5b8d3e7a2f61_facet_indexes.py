@@ -0,0 +1,34 @@
+"""genre, area and seeking indexes for faceted listings
+
+Revision ID: 5b8d3e7a2f61
+Revises: e6b2f9a4c1d8
+Create Date: 2026-10-18 15:47:12.804519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8d3e7a2f61'
+down_revision = 'e6b2f9a4c1d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_genres', 'venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_venue_seeking_talent', 'venue', ['state', 'city', 'name', 'id'], unique=False,
+                    postgresql_where=sa.text('seeking_talent'))
+    op.create_index('ix_artist_state_city', 'artist', ['state', 'city'], unique=False)
+    op.create_index('ix_artist_genres', 'artist', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artist_seeking_venue', 'artist', ['name', 'id'], unique=False,
+                    postgresql_where=sa.text('seeking_venue'))
+
+
+def downgrade():
+    op.drop_index('ix_artist_seeking_venue', table_name='artist')
+    op.drop_index('ix_artist_genres', table_name='artist')
+    op.drop_index('ix_artist_state_city', table_name='artist')
+    op.drop_index('ix_venue_seeking_talent', table_name='venue')
+    op.drop_index('ix_venue_genres', table_name='venue')
@@ -0,0 +1,24 @@
+"""venue area index
+
+Revision ID: 6f1c2a9d4b7e
+Revises: 29dd21c4df3a
+Create Date: 2026-10-18 09:12:41.218305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1c2a9d4b7e'
+down_revision = '29dd21c4df3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_state_city_name', 'venue', ['state', 'city', 'name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_state_city_name', table_name='venue')
@@ -0,0 +1,38 @@
+"""recommendation table
+
+Revision ID: 8e3b0c6d2f47
+Revises: c71f4a0d9e23
+Create Date: 2026-10-18 17:12:08.553914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3b0c6d2f47'
+down_revision = 'c71f4a0d9e23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recommendation',
+    sa.Column('subject', sa.String(length=6), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.SmallInteger(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('subject', 'artist_id', 'venue_id')
+    )
+    op.create_index('ix_recommendation_artist_rank', 'recommendation', ['subject', 'artist_id', 'rank'], unique=False)
+    op.create_index('ix_recommendation_venue_rank', 'recommendation', ['subject', 'venue_id', 'rank'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_recommendation_venue_rank', table_name='recommendation')
+    op.drop_index('ix_recommendation_artist_rank', table_name='recommendation')
+    op.drop_table('recommendation')
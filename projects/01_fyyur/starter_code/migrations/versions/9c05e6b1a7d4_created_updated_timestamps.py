@@ -0,0 +1,30 @@
+"""created and updated timestamps
+
+Revision ID: 9c05e6b1a7d4
+Revises: 4a9e7c2b8d30
+Create Date: 2026-10-18 13:58:09.662731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c05e6b1a7d4'
+down_revision = '4a9e7c2b8d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('created_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False))
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
@@ -0,0 +1,26 @@
+"""keyset pagination indexes
+
+Revision ID: b3e8d51f0a62
+Revises: 6f1c2a9d4b7e
+Create Date: 2026-10-18 10:03:17.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8d51f0a62'
+down_revision = '6f1c2a9d4b7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'], unique=False)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_artist_name_id', table_name='artist')
@@ -0,0 +1,35 @@
+"""venue coordinates and spatial index
+
+Revision ID: c71f4a0d9e23
+Revises: 5b8d3e7a2f61
+Create Date: 2026-10-18 16:31:54.210377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71f4a0d9e23'
+down_revision = '5b8d3e7a2f61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.create_check_constraint('ck_venue_latitude_longitude', 'venue', '(latitude IS NULL) = (longitude IS NULL)')
+    op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+    op.execute('CREATE EXTENSION IF NOT EXISTS earthdistance')
+    op.execute(
+        'CREATE INDEX ix_venue_earth ON venue '
+        'USING gist (ll_to_earth(latitude, longitude)) WHERE latitude IS NOT NULL'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_venue_earth', table_name='venue')
+    op.drop_constraint('ck_venue_latitude_longitude', 'venue', type_='check')
+    op.drop_column('venue', 'longitude')
+    op.drop_column('venue', 'latitude')
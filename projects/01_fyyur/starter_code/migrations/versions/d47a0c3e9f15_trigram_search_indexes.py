@@ -0,0 +1,45 @@
+"""trigram search indexes
+
+Revision ID: d47a0c3e9f15
+Revises: b3e8d51f0a62
+Create Date: 2026-10-18 11:26:05.771430
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd47a0c3e9f15'
+down_revision = 'b3e8d51f0a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # array_to_string is only STABLE, so wrap the searchable columns in an
+    # IMMUTABLE function that an expression index is allowed to use
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_search_text(
+            name varchar, city varchar, state varchar, genres varchar[]
+        ) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT coalesce(name, '') || ' ' || coalesce(city, '') || ' ' ||
+                   coalesce(state, '') || ' ' || coalesce(array_to_string(genres, ' '), '')
+        $$
+    """)
+    op.execute(
+        'CREATE INDEX ix_venue_search_trgm ON venue '
+        'USING gin (fyyur_search_text(name, city, state, genres) gin_trgm_ops)'
+    )
+    op.execute(
+        'CREATE INDEX ix_artist_search_trgm ON artist '
+        'USING gin (fyyur_search_text(name, city, state, genres) gin_trgm_ops)'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_artist_search_trgm', table_name='artist')
+    op.drop_index('ix_venue_search_trgm', table_name='venue')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_text(varchar, varchar, varchar, varchar[])')
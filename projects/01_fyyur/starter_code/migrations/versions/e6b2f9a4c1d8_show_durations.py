@@ -0,0 +1,44 @@
+"""show durations and no double-booked venues
+
+Revision ID: e6b2f9a4c1d8
+Revises: 9c05e6b1a7d4
+Create Date: 2026-10-18 15:02:41.318206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2f9a4c1d8'
+down_revision = '9c05e6b1a7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows get the form's default two hours, cut short where the
+    # venue's next show starts earlier, so the constraint below holds for them
+    op.execute("""
+        UPDATE "show" SET end_time = least(
+            "show".start_time + interval '2 hours',
+            coalesce(ordered.next_start_time, 'infinity')
+        )
+        FROM (
+            SELECT id, lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_start_time
+            FROM "show"
+        ) AS ordered
+        WHERE ordered.id = "show".id
+    """)
+    op.alter_column('show', 'end_time', nullable=False)
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE "show" ADD CONSTRAINT ex_show_venue_no_overlap '
+        'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+
+
+def downgrade():
+    op.drop_constraint('ex_show_venue_no_overlap', 'show')
+    op.drop_column('show', 'end_time')
@@ -0,0 +1,42 @@
+"""home feed
+
+Revision ID: f3a7d1c9b520
+Revises: 8e3b0c6d2f47
+Create Date: 2026-10-18 17:48:31.097215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7d1c9b520'
+down_revision = '8e3b0c6d2f47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_item',
+    sa.Column('kind', sa.String(length=6), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('section', sa.String(length=8), nullable=False),
+    sa.Column('at', sa.DateTime(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('subtitle', sa.String(), nullable=True),
+    sa.Column('image_link', sa.String(length=500), nullable=True),
+    sa.Column('venue_id', sa.Integer(), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('kind', 'item_id')
+    )
+    op.create_index('ix_feed_item_section_at', 'feed_item', ['section', 'at'], unique=False)
+    op.create_index('ix_feed_item_venue_id', 'feed_item', ['venue_id'], unique=False, postgresql_where=sa.text('venue_id IS NOT NULL'))
+    op.create_index('ix_feed_item_artist_id', 'feed_item', ['artist_id'], unique=False, postgresql_where=sa.text('artist_id IS NOT NULL'))
+    # filled by `flask fyyur feed`, or as venues, artists and shows are written
+
+
+def downgrade():
+    op.drop_index('ix_feed_item_artist_id', table_name='feed_item')
+    op.drop_index('ix_feed_item_venue_id', table_name='feed_item')
+    op.drop_index('ix_feed_item_section_at', table_name='feed_item')
+    op.drop_table('feed_item')
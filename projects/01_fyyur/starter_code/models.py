@@ -1,10 +1,52 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()                    #reads of GET requests go to a replica when one is configured
+
+# The app runs on Postgres. These two keep the schema creatable with
+# db.create_all() on SQLite, for tests of the paths that do not need
+# Postgres (trigram search and the spatial index do; the genre filters
+# and facets have a slower fallback).
+
+class Genres(db.TypeDecorator):
+    """ varchar[] on Postgres, a JSON list elsewhere """
+    impl = db.ARRAY(db.String)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(self.impl)
+        return dialect.type_descriptor(db.JSON())
+
+class utcnow(FunctionElement):
+    """ Server side default of the created_at/updated_at columns """
+    type = db.DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _utcnow(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'              #UTC on SQLite
+
+@compiles(utcnow, 'postgresql')
+def _utcnow_postgresql(element, compiler, **kw):
+    return "timezone('utc', now())"
 
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_state_city_name', 'state', 'city', 'name'),    #backs the area grouping on /venues
+        db.Index('ix_venue_updated_at', 'updated_at'),                    #latest change, for http validators
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),    #?genre= filter, genres @> array
+        db.Index('ix_venue_seeking_talent', 'state', 'city', 'name', 'id',
+                 postgresql_where=db.text('seeking_talent')),             #?seeking_talent=1, in listing order
+        db.CheckConstraint('(latitude IS NULL) = (longitude IS NULL)', name='ck_venue_latitude_longitude'),
+        # plus ix_venue_earth, a GiST index on ll_to_earth(latitude, longitude)
+        # (earthdistance) created by its migration
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -15,22 +57,41 @@ class Venue(db.Model):
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(Genres, nullable=False)
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String)
 
+    latitude = db.Column(db.Float)          #degrees, entered with the venue, both or neither
+    longitude = db.Column(db.Float)
+
+    # kept by counters.py: bumped with each new show, moved from upcoming to
+    # past by the reconcile-counts job as start times pass
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=utcnow())
+
     children = db.relationship('Show', backref='venue', lazy=True)
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_name_id', 'name', 'id'),                      #keyset pagination on /artists
+        db.Index('ix_artist_updated_at', 'updated_at'),
+        db.Index('ix_artist_state_city', 'state', 'city'),                #?city=&state= filter
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artist_seeking_venue', 'name', 'id',
+                 postgresql_where=db.text('seeking_venue')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(Genres, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
@@ -38,14 +99,72 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String())
 
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=utcnow())
+
     children = db.relationship('Show', backref='artist', lazy=True)
 
 class Show(db.Model):
     __tablename__ = 'show'
+    __table_args__ = (
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),            #keyset pagination on /shows
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),    #shows of one venue, in time order
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),  #shows of one artist, in time order
+        db.Index('ix_show_updated_at', 'updated_at'),
+        # plus ex_show_venue_no_overlap, a btree_gist exclusion constraint on
+        # (venue_id, tsrange(start_time, end_time)) created by its migration
+    )
 
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    end_time = db.Column(db.DateTime, nullable=False)
 
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
 
-    id = db.Column(db.Integer, primary_key=True)
\ No newline at end of file
+    id = db.Column(db.Integer, primary_key=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=utcnow())
+
+class Recommendation(db.Model):
+    # the top suggestions of each artist and venue, kept by recommend.py:
+    # subject 'artist' rows are venues suggested to artist_id, 'venue' rows
+    # artists suggested to venue_id, best first by rank
+    __tablename__ = 'recommendation'
+    __table_args__ = (
+        db.Index('ix_recommendation_artist_rank', 'subject', 'artist_id', 'rank'),    #suggestions of one artist, in order
+        db.Index('ix_recommendation_venue_rank', 'subject', 'venue_id', 'rank'),
+    )
+
+    subject = db.Column(db.String(6), primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.SmallInteger, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=utcnow())
+
+class FeedItem(db.Model):
+    # the home page, kept by feed.py: the newest venue/artist listings
+    # (section 'recent', at = created_at) and the next shows (section
+    # 'upcoming', at = start_time), with what the page prints copied in
+    __tablename__ = 'feed_item'
+    __table_args__ = (
+        db.Index('ix_feed_item_section_at', 'section', 'at'),               #the home page read, and trimming
+        db.Index('ix_feed_item_venue_id', 'venue_id', postgresql_where=db.text('venue_id IS NOT NULL')),
+        db.Index('ix_feed_item_artist_id', 'artist_id', postgresql_where=db.text('artist_id IS NOT NULL')),
+    )
+
+    kind = db.Column(db.String(6), primary_key=True)         #'venue', 'artist' or 'show'
+    item_id = db.Column(db.Integer, primary_key=True)
+    section = db.Column(db.String(8), nullable=False)
+    at = db.Column(db.DateTime, nullable=False)
+
+    title = db.Column(db.String, nullable=False)
+    subtitle = db.Column(db.String)
+    image_link = db.Column(db.String(500))
+    venue_id = db.Column(db.Integer)        #of a show, to follow renames
+    artist_id = db.Column(db.Integer)
@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request, url_for
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    """ Pack the sort key of a row into an opaque, url safe token.
+
+    datetimes are tagged so they survive the json round trip.
+    """
+    packed = [{'$dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(packed, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """ Inverse of encode_cursor, returns None for a missing or tampered token """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        packed = json.loads(raw)
+        return tuple(
+            datetime.fromisoformat(value['$dt']) if isinstance(value, dict) else value
+            for value in packed
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class KeysetPage(object):
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, columns, key, after=None, before=None, page_size=None):
+    """ Seek to one page of an ascending ordering over columns.
+
+    The last column must be unique (the primary key) so the ordering is total.
+    The filter is a row-value comparison, so it is answered from an index on
+    the same columns and page 1000 costs the same as page 1.
+    key maps a returned row to its sort values and is what the cursors hold.
+    """
+    page_size = page_size or current_app.config['PAGE_SIZE']
+    after = decode_cursor(after)
+    before = decode_cursor(before)
+    if before is not None and len(before) == len(columns):
+        rows = query.filter(tuple_(*columns) < before).order_by(
+            *[column.desc() for column in columns]
+        ).limit(page_size + 1).all()
+        more = len(rows) > page_size
+        items = list(reversed(rows[:page_size]))
+        return KeysetPage(
+            items,
+            next_cursor=encode_cursor(key(items[-1])) if items else None,
+            prev_cursor=encode_cursor(key(items[0])) if more else None,
+        )
+
+    if after is not None and len(after) == len(columns):
+        query = query.filter(tuple_(*columns) > after)
+    else:
+        after = None
+    rows = query.order_by(*columns).limit(page_size + 1).all()
+    more = len(rows) > page_size
+    items = rows[:page_size]
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(key(items[-1])) if more else None,
+        prev_cursor=encode_cursor(key(items[0])) if after is not None and items else None,
+    )
+
+
+def page_url(after=None, before=None):
+    """ url for the current view with the cursor swapped, other args are kept """
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    if after:
+        args['after'] = after
+    if before:
+        args['before'] = before
+    return url_for(request.endpoint, **dict(request.view_args or {}, **args))
+
+
+def init_app(app):
+    app.config.setdefault('PAGE_SIZE', 50)
+    app.config.setdefault('API_MAX_PAGE_SIZE', 500)
+    app.jinja_env.globals['page_url'] = page_url
@@ -0,0 +1,222 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import db, Venue, Artist, Show
+from pagination import keyset_paginate
+
+# public field name -> column, shared by the html pages and the json api
+VENUE_FIELDS = {
+    "id": Venue.id,
+    "name": Venue.name,
+    "genres": Venue.genres,
+    "address": Venue.address,
+    "city": Venue.city,
+    "state": Venue.state,
+    "phone": Venue.phone,
+    "website": Venue.website,
+    "facebook_link": Venue.facebook_link,
+    "seeking_talent": Venue.seeking_talent,
+    "seeking_description": Venue.seeking_description,
+    "image_link": Venue.image_link,
+    "latitude": Venue.latitude,
+    "longitude": Venue.longitude,
+    "upcoming_shows_count": Venue.upcoming_shows_count,
+    "past_shows_count": Venue.past_shows_count,
+    "updated_at": Venue.updated_at,
+}
+
+ARTIST_FIELDS = {
+    "id": Artist.id,
+    "name": Artist.name,
+    "genres": Artist.genres,
+    "city": Artist.city,
+    "state": Artist.state,
+    "phone": Artist.phone,
+    "facebook_link": Artist.facebook_link,
+    "website": Artist.website_link,
+    "seeking_venue": Artist.seeking_venue,
+    "seeking_description": Artist.seeking_description,
+    "image_link": Artist.image_link,
+    "upcoming_shows_count": Artist.upcoming_shows_count,
+    "past_shows_count": Artist.past_shows_count,
+    "updated_at": Artist.updated_at,
+}
+
+SHOW_FIELDS = {
+    "id": Show.id,
+    "start_time": Show.start_time,
+    "end_time": Show.end_time,
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name,
+    "venue_image_link": Venue.image_link,
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name,
+    "artist_image_link": Artist.image_link,
+    "updated_at": Show.updated_at,
+    "venue_updated_at": Venue.updated_at,
+    "artist_updated_at": Artist.updated_at,
+}
+
+# fields of a venue/artist detail that come from its shows
+DETAIL_SHOW_FIELDS = ("past_shows", "upcoming_shows")
+
+# kind -> (model, its fields, the other side of its shows, show column pointing
+#          at the model, at the other side, prefix of the other side's show fields)
+DETAILS = {
+    'venue': (Venue, VENUE_FIELDS, Artist, Show.venue_id, Show.artist_id, "artist"),
+    'artist': (Artist, ARTIST_FIELDS, Venue, Show.artist_id, Show.venue_id, "venue"),
+}
+
+
+def parse_fields(value, allowed):
+    """ ?fields=a,b,c -> ['a', 'b', 'c'], None when absent; unknown names raise ValueError """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError('Unknown fields: ' + ', '.join(unknown))
+    return fields
+
+
+def partition_shows(shows, now):
+    # split shows into past and upcoming in a single pass, a show starting right now is upcoming
+    past_shows = []
+    upcoming_shows = []
+    for show in shows:
+        if show["start_time"] < now:
+            past_shows.append(show)
+        else:
+            upcoming_shows.append(show)
+    return past_shows, upcoming_shows
+
+
+def _show_columns(other):
+    return (
+        Show.start_time.label('show_start_time'),
+        other.id.label('other_id'),
+        other.name.label('other_name'),
+        other.image_link.label('other_image_link'),
+        other.updated_at.label('other_updated_at'),
+    )
+
+
+def _show(prefix, row):
+    return {
+        prefix + "_id": row.other_id,
+        prefix + "_name": row.other_name,
+        prefix + "_image_link": row.other_image_link,
+        prefix + "_updated_at": row.other_updated_at,
+        "start_time": row.show_start_time
+    }
+
+
+def _shows(past_shows, upcoming_shows):
+    return {
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }
+
+
+def _detail(model, columns, other, own_key, other_key, prefix, id, fields):
+    """ One entity and, if any show field is wanted, all of its shows in one round trip.
+
+    Only the columns behind the requested fields are selected. The show
+    counts come from the maintained columns, unless the shows are fetched
+    anyway: then they are counted from the lists so the two always agree.
+    """
+    fields = fields or list(columns) + list(DETAIL_SHOW_FIELDS)
+    names = ['id'] + [field for field in fields if field in columns and field != 'id']
+    query = db.session.query(*[columns[name].label(name) for name in names])
+    with_shows = any(field in DETAIL_SHOW_FIELDS for field in fields)
+    if with_shows:
+        query = query.add_columns(
+            *_show_columns(other)
+        ).outerjoin(
+            Show, own_key == model.id
+        ).outerjoin(
+            other, other.id == other_key
+        ).order_by(Show.start_time)
+    rows = query.filter(model.id == id).all()
+    if not rows:
+        return None
+
+    detail = {name: getattr(rows[0], name) for name in names if name in fields}
+    if with_shows:
+        shows = _shows(*partition_shows(
+            [_show(prefix, row) for row in rows if row.show_start_time is not None], datetime.now()
+        ))
+        detail.update((field, shows[field]) for field in shows if field in fields)
+    return detail
+
+
+def venue_detail(venue_id, fields=None):
+    return _detail(*DETAILS['venue'], venue_id, fields)
+
+
+def artist_detail(artist_id, fields=None):
+    return _detail(*DETAILS['artist'], artist_id, fields)
+
+
+def detail_statements(kind, id, now):
+    """ The entity, its past shows and its upcoming shows as three independent
+    statements, for the async pages of asgi.py to run at the same time
+    """
+    model, columns, other, own_key, other_key, prefix = DETAILS[kind]
+    entity = select(*[column.label(name) for name, column in columns.items()]).where(model.id == id)
+    shows = select(*_show_columns(other)).join(other, other.id == other_key).where(own_key == id).order_by(Show.start_time)
+    return entity, shows.where(Show.start_time < now), shows.where(Show.start_time >= now)
+
+
+def assemble_detail(kind, entity, past, upcoming):
+    """ The venue_detail/artist_detail dict from the rows of detail_statements """
+    if entity is None:
+        return None
+    prefix = DETAILS[kind][5]
+    detail = dict(entity._mapping)
+    detail.update(_shows([_show(prefix, row) for row in past], [_show(prefix, row) for row in upcoming]))
+    return detail
+
+
+def _page(columns, sort_columns, fields, query=None, after=None, before=None, page_size=None):
+    """ One keyset page of dicts holding only the requested fields """
+    fields = fields or list(columns)
+    sort_labels = ['sort_{}'.format(position) for position in range(len(sort_columns))]
+    selected = [columns[field].label(field) for field in fields] + [
+        column.label(label) for column, label in zip(sort_columns, sort_labels)
+    ]
+    if query is None:
+        query = db.session.query()
+    query = query.add_columns(*selected)
+    page = keyset_paginate(
+        query,
+        sort_columns,
+        key=lambda row: tuple(row._mapping[label] for label in sort_labels),
+        after=after,
+        before=before,
+        page_size=page_size,
+    )
+    page.items = [{field: row._mapping[field] for field in fields} for row in page.items]
+    return page
+
+
+def venue_page(fields=None, **cursor):
+    # area order, backed by the (state, city, name) index
+    return _page(VENUE_FIELDS, [Venue.state, Venue.city, Venue.name, Venue.id], fields, **cursor)
+
+
+def artist_page(fields=None, **cursor):
+    return _page(ARTIST_FIELDS, [Artist.name, Artist.id], fields, **cursor)
+
+
+def show_page(fields=None, **cursor):
+    # venue and artist columns come from the same join, never from per-row lazy loads
+    query = db.session.query().select_from(Show).join(
+        Venue, Venue.id == Show.venue_id
+    ).join(
+        Artist, Artist.id == Show.artist_id
+    )
+    return _page(SHOW_FIELDS, [Show.start_time, Show.id], fields, query, **cursor)
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_counters = []
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+    for counter in _counters:
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+def _listen():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+
+
+@contextmanager
+def count_queries():
+    """ Count every statement issued inside the block, for use in tests:
+
+        with count_queries() as counter:
+            client.get('/shows')
+        assert counter.count == 1
+    """
+    _listen()
+    counter = QueryCounter()
+    _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        _counters.remove(counter)
+
+
+def _start_count():
+    g.query_count = 0
+
+
+def _check_budget(response):
+    count = g.pop('query_count', None)
+    if count is None:
+        return response
+    response.headers['X-Query-Count'] = str(count)
+    budget = current_app.config['QUERY_BUDGETS'].get(request.endpoint)
+    if budget is not None and count > budget:
+        message = '{} issued {} queries, budget is {} (N+1 query?)'.format(request.endpoint, count, budget)
+        if current_app.testing:
+            raise AssertionError(message)                                 #fail the test that made the request
+        current_app.logger.warning(message)
+    return response
+
+
+def init_app(app):
+    """ Count the SQL statements of every request when QUERY_COUNT_ENABLED is on.
+
+    The count is sent back as X-Query-Count. A route that goes over its entry
+    in QUERY_BUDGETS logs a warning, or fails the request under TESTING, so a
+    listing whose query count grows with the number of rows is caught early.
+    """
+    app.config.setdefault('QUERY_COUNT_ENABLED', False)
+    app.config.setdefault('QUERY_BUDGETS', {})
+    if not app.config['QUERY_COUNT_ENABLED']:
+        return
+    _listen()
+    app.before_request(_start_count)
+    app.after_request(_check_budget)
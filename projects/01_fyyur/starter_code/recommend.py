@@ -0,0 +1,351 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+import cache
+from models import db, Venue, Artist, Recommendation
+
+np = None                                                               #numpy, once available() has imported it
+
+# subject -> (model, its seeking flag, column of the subject, column of the suggestion)
+SIDES = {
+    'artist': (Artist, 'seeking_venue', 'artist_id', 'venue_id'),
+    'venue': (Venue, 'seeking_talent', 'venue_id', 'artist_id'),
+}
+OTHER = {'artist': 'venue', 'venue': 'artist'}
+
+# a suggestion's score is the cosine similarity of the two genre sets, raised
+# by these fractions when both are in the same state / the same city
+SAME_STATE_BONUS = 0.25
+SAME_CITY_BONUS = 0.5
+
+
+def available():
+    """ Whether numpy is installed; without it suggestions are served, never
+    refreshed. It is imported here, on first use, rather than at startup:
+    only scoring needs it and it is the slowest import of the app.
+    """
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+class Features(object):
+    """ One side (every artist or every venue) as arrays, row i describing ids[i].
+
+    genres is the multi-hot genre matrix with unit-length rows, so a matrix
+    product gives cosine similarities; states and cities are integer codes
+    shared with the other side, so a location match is an equality test.
+    """
+
+    def __init__(self, ids, genres, states, cities, seeking):
+        self.ids = ids
+        self.genres = genres
+        self.states = states
+        self.cities = cities
+        self.seeking = seeking
+        self.rows = {id: row for row, id in enumerate(ids.tolist())}
+
+
+def _encode(rows, vocabulary, states, cities):
+    genres = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+    for row, (id, names, state, city, seeking) in enumerate(rows):
+        genres[row, [vocabulary[name] for name in names or ()]] = 1.0
+    norms = np.linalg.norm(genres, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return Features(
+        np.array([row[0] for row in rows], dtype=np.int64),
+        genres / norms,
+        np.array([states.setdefault(row[2], len(states)) for row in rows], dtype=np.int32),
+        np.array([cities.setdefault((row[3].strip().lower(), row[2]), len(cities)) for row in rows], dtype=np.int32),
+        np.array([bool(row[4]) for row in rows], dtype=bool),
+    )
+
+
+def load_features(only=None):
+    """ {'artist': Features, 'venue': Features}, one query per side. only maps a
+    side to the ids to load of it, e.g. the rows that changed, instead of all
+    """
+    rows = {}
+    for subject, (model, seeking, own, other) in SIDES.items():
+        query = db.session.query(model.id, model.genres, model.state, model.city, getattr(model, seeking))
+        if only and subject in only:
+            query = query.filter(model.id.in_(only[subject]))
+        rows[subject] = query.order_by(model.id).all()
+    vocabulary = {name: column for column, name in enumerate(sorted(
+        {name for side in rows.values() for row in side for name in row[1] or ()}
+    ))}
+    states, cities = {}, {}
+    return {subject: _encode(side, vocabulary, states, cities) for subject, side in rows.items()}
+
+
+def scores(subjects, rows, candidates):
+    """ (len(rows), len(candidates.ids)) scores of the subjects at `rows` against
+    every candidate; candidates that are not seeking score 0
+    """
+    found = subjects.genres[rows] @ candidates.genres.T
+    found *= (
+        1.0
+        + SAME_STATE_BONUS * (subjects.states[rows, None] == candidates.states[None, :])
+        + SAME_CITY_BONUS * (subjects.cities[rows, None] == candidates.cities[None, :])
+    )
+    found[:, ~candidates.seeking] = 0.0
+    return found
+
+
+def top_k(block, k):
+    """ Column positions and scores of the k best of each row, best first.
+    argpartition finds them in linear time, only those k get sorted.
+    """
+    k = min(k, block.shape[1])
+    if k == 0:
+        return np.empty((block.shape[0], 0), dtype=np.int64), np.empty((block.shape[0], 0), dtype=block.dtype)
+    best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(block, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def _batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _rebuild(subject, ids, features):
+    """ Replace the stored suggestions of the given subjects, a batch of rows at a time """
+    own, other = SIDES[subject][2], SIDES[subject][3]
+    subjects, candidates = features[subject], features[OTHER[subject]]
+    query = db.session.query(Recommendation).filter(Recommendation.subject == subject)
+    if ids is None:
+        query.delete(synchronize_session=False)
+        rows = np.arange(len(subjects.ids))
+    else:
+        query.filter(getattr(Recommendation, own).in_(ids)).delete(synchronize_session=False)
+        rows = np.array([subjects.rows[id] for id in ids if id in subjects.rows], dtype=np.int64)
+    now = datetime.utcnow()
+    config = current_app.config
+    for batch in _batches(rows, config['RECOMMENDATIONS_BATCH_ROWS']):
+        positions, best = top_k(scores(subjects, batch, candidates), config['RECOMMENDATIONS_K'])
+        values = [
+            {"subject": subject, own: int(subjects.ids[row]), other: int(candidates.ids[position]),
+             "rank": rank, "score": float(score), "refreshed_at": now}
+            for row, row_positions, row_scores in zip(batch, positions, best)
+            for rank, (position, score) in enumerate(zip(row_positions, row_scores))
+            if score > 0
+        ]
+        if values:
+            db.session.execute(Recommendation.__table__.insert(), values)
+
+
+def _new_scores(subject, ids, features):
+    """ Yield (subject ids, scores) blocks: the changed subjects against
+    every candidate of the other side, one batch of subjects at a time.
+
+    The score is symmetric, only the seeking filter is not: a subject can
+    enter the lists of the other side only if it is seeking itself.
+    """
+    subjects, candidates = features[subject], features[OTHER[subject]]
+    rows = np.array([subjects.rows[id] for id in ids if id in subjects.rows and subjects.seeking[subjects.rows[id]]], dtype=np.int64)
+    everyone = Features(candidates.ids, candidates.genres, candidates.states, candidates.cities,
+                        np.ones(len(candidates.ids), dtype=bool))
+    for batch in _batches(rows, current_app.config['RECOMMENDATIONS_BATCH_ROWS']):
+        yield subjects.ids[batch], scores(subjects, batch, everyone)
+
+
+def _stored_lists(subject, ids):
+    """ {id: [(suggested id, score), ...] best first} of the stored lists of these subjects """
+    own, other = SIDES[subject][2], SIDES[subject][3]
+    lists = {}
+    for batch in _batches(ids, current_app.config['RECOMMENDATIONS_BATCH_ROWS']):
+        for id, suggested, score in db.session.query(
+            getattr(Recommendation, own), getattr(Recommendation, other), Recommendation.score
+        ).filter(Recommendation.subject == subject, getattr(Recommendation, own).in_(batch)).order_by(
+            getattr(Recommendation, own), Recommendation.rank
+        ):
+            lists.setdefault(id, []).append((suggested, score))
+    return lists
+
+
+def _merge(subject, ids, features):
+    """ Update the other side's lists with the new scores of the changed
+    subjects, without scoring those lists again.
+
+    Returns (ids of the lists merged, ids of the lists left to rebuild): a
+    full list a changed subject fell below the last of, or out of, would have
+    to take a candidate it does not store.
+    """
+    counterpart = OTHER[subject]
+    own, other = SIDES[counterpart][2], SIDES[counterpart][3]
+    candidates = features[counterpart]
+    k = current_app.config['RECOMMENDATIONS_K']
+    changed = set(ids)
+
+    listing = {id for id, in db.session.query(getattr(Recommendation, own)).filter(
+        Recommendation.subject == counterpart, getattr(Recommendation, other).in_(ids)
+    )}
+    best = np.zeros(len(candidates.ids), dtype=np.float32)
+    for subject_ids, block in _new_scores(subject, ids, features):
+        np.maximum(best, block.max(axis=0), out=best)
+    reached = candidates.ids[best > 0].tolist()
+    lists = _stored_lists(counterpart, sorted(listing | set(reached)))
+    # a list takes a changed subject if it is not full or the subject beats its last
+    entering = {
+        id for id, score in zip(reached, best[best > 0].tolist())
+        if len(lists.get(id, ())) < k or score > lists[id][-1][1]
+    }
+    affected = listing | entering
+    new = {}
+    for subject_ids, block in _new_scores(subject, ids, features):
+        for row, position in zip(*np.nonzero(block > 0)):
+            id = int(candidates.ids[position])
+            if id in affected:
+                new.setdefault(id, {})[int(subject_ids[row])] = float(block[row, position])
+
+    merged, incomplete = [], []
+    values = []
+    now = datetime.utcnow()
+    for id in sorted(affected):
+        stored = lists.get(id, [])
+        scored = new.get(id, {})
+        if len(stored) >= k and any(
+            suggested in changed and scored.get(suggested, 0.0) < stored[-1][1] for suggested, score in stored
+        ):
+            incomplete.append(id)
+            continue
+        suggestions = [(suggested, score) for suggested, score in stored if suggested not in changed]
+        suggestions.extend(scored.items())
+        suggestions.sort(key=lambda suggestion: -suggestion[1])
+        values.extend(
+            {"subject": counterpart, own: id, other: suggested, "rank": rank, "score": score, "refreshed_at": now}
+            for rank, (suggested, score) in enumerate(suggestions[:k])
+        )
+        merged.append(id)
+    for batch in _batches(merged, current_app.config['RECOMMENDATIONS_BATCH_ROWS']):
+        db.session.query(Recommendation).filter(
+            Recommendation.subject == counterpart, getattr(Recommendation, own).in_(batch)
+        ).delete(synchronize_session=False)
+    if values:
+        db.session.execute(Recommendation.__table__.insert(), values)
+    return merged, incomplete
+
+
+def _refresh(subject, ids):
+    counterpart = OTHER[subject]
+    features = load_features({subject: ids})
+    _rebuild(subject, ids, features)
+    merged, incomplete = _merge(subject, ids, features)
+    if incomplete:
+        _rebuild(counterpart, incomplete, load_features({counterpart: incomplete}))
+    db.session.commit()
+    return merged + incomplete
+
+
+def refresh(subject, ids):
+    """ Recompute the suggestions of the given artists or venues after they were
+    created or edited, and the other side's lists they enter or leave. Commits.
+
+    Only the changed rows are loaded of their side. Their lists are scored
+    against every candidate, and their new scores merged into the other
+    side's lists; only a full list one of them drops below the last of is
+    scored again, against every row of their side. Stored lists are taken
+    to be current: after writes that bypassed this (SQL, a seed script),
+    run `flask fyyur recommend`.
+
+    It runs once the caller's write is committed, so a failure is logged
+    rather than raised: the suggestions stay as they were until the next
+    refresh or `flask fyyur recommend`.
+    """
+    ids = [int(id) for id in ids]
+    if not ids or not available():
+        return
+    try:
+        affected = _refresh(subject, ids)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Could not refresh the suggestions of %s %s', subject, ids)
+        return
+    cache.invalidate(subject, *ids)
+    cache.invalidate(OTHER[subject], *affected)
+
+
+def suggested_to(subject, id):
+    """ ids of the other side whose suggestions include this artist or venue """
+    counterpart = OTHER[subject]
+    own, other = SIDES[counterpart][2], SIDES[counterpart][3]
+    return [found for found, in db.session.query(getattr(Recommendation, own)).filter(
+        Recommendation.subject == counterpart, getattr(Recommendation, other) == id
+    )]
+
+
+def rebuild(subject, ids):
+    """ Recompute the lists of these subjects only, e.g. the ones that listed a
+    deleted venue or artist. Commits.
+
+    Like refresh, it runs after the caller's delete is committed and logs a
+    failure instead of raising it.
+    """
+    ids = [int(id) for id in ids]
+    if not ids or not available():
+        return
+    try:
+        _rebuild(subject, ids, load_features({subject: ids}))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Could not rebuild the suggestions of %s %s', subject, ids)
+        return
+    cache.invalidate(subject, *ids)
+
+
+def refresh_all():
+    """ Recompute every list in one transaction. Returns (artists, venues) scored """
+    features = load_features()
+    for subject in SIDES:
+        _rebuild(subject, None, features)
+    db.session.commit()
+    for subject in SIDES:
+        cache.invalidate(subject, *features[subject].ids.tolist())
+    return len(features['artist'].ids), len(features['venue'].ids)
+
+
+def suggestions_statement(subject, id, limit):
+    """ The stored suggestions of an artist ('artist') or venue ('venue'), best
+    first: one range scan of the (subject, id, rank) index joined to the names
+    """
+    model = SIDES[OTHER[subject]][0]
+    own, other = SIDES[subject][2], SIDES[subject][3]
+    return select(
+        model.id, model.name, model.city, model.state, model.image_link, Recommendation.score,
+    ).join(
+        Recommendation, getattr(Recommendation, other) == model.id
+    ).where(
+        Recommendation.subject == subject, getattr(Recommendation, own) == id
+    ).order_by(Recommendation.rank).limit(limit)
+
+
+def suggestions(subject, id, limit=None):
+    statement = suggestions_statement(subject, id, limit or current_app.config['RECOMMENDATIONS_K'])
+    return [dict(row._mapping) for row in db.session.execute(statement)]
+
+
+@click.command('recommend')
+@with_appcontext
+def recommend_command():
+    """ Recompute every artist's and venue's suggestions. """
+    if not available():
+        raise click.ClickException('NumPy is required to compute suggestions.')
+    artists, venues = refresh_all()
+    click.echo('Scored {} artists against {} venues.'.format(artists, venues))
+
+
+def init_app(app):
+    app.config.setdefault('RECOMMENDATIONS_K', 6)
+    app.config.setdefault('RECOMMENDATIONS_BATCH_ROWS', 512)
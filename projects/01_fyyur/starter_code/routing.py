@@ -0,0 +1,78 @@
+import random
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm
+
+import dbpool
+
+# set after a write, holds the time until which this client reads from the primary
+PRIMARY_COOKIE = 'fyyur_primary_until'
+
+
+class RoutingSession(SignallingSession):
+    """ Session that sends reads of a read-only request to the replica picked for it.
+
+    Anything flushed goes to the primary, whatever the request.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = g.get('db_replica') if has_request_context() else None
+        if replica is not None and not self._flushing:
+            return replica
+        return super(RoutingSession, self).get_bind(mapper=mapper, clause=clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def _read_only():
+    """ GET/HEAD, and the POST views that only read, e.g. the search forms """
+    return request.method in ('GET', 'HEAD') or request.endpoint in current_app.config['READ_ONLY_POST_ENDPOINTS']
+
+
+def _pick_replica():
+    if not _read_only():
+        return
+    primary_until = request.cookies.get(PRIMARY_COOKIE, type=float)
+    if primary_until and primary_until > time.time():
+        return                                                        #read your own recent writes
+    g.db_replica = random.choice(current_app.extensions['db_replicas'])
+
+
+def _remember_write(response):
+    window = current_app.config['READ_YOUR_WRITES_SECONDS']
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and not _read_only() and response.status_code < 500 and window:
+        response.set_cookie(
+            PRIMARY_COOKIE, '{:.3f}'.format(time.time() + window),
+            max_age=window, httponly=True, samesite='Lax'
+        )
+    return response
+
+
+def replica_engines(app=None):
+    return (app or current_app).extensions.get('db_replicas', [])
+
+
+def init_app(app):
+    """ Route read-only requests to one of SQLALCHEMY_REPLICA_URIS: GET/HEAD,
+    and POSTs to the endpoints in READ_ONLY_POST_ENDPOINTS.
+
+    create_*, edit_* and delete_venue are other POSTs and stay on the primary.
+    After a write the client keeps reading from the primary for
+    READ_YOUR_WRITES_SECONDS, so it sees its own change despite replica lag.
+    Without replicas configured nothing changes.
+    """
+    app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+    app.config.setdefault('READ_ONLY_POST_ENDPOINTS', ('search_venues', 'search_artists'))
+    app.extensions['db_replicas'] = [
+        create_engine(uri, **dbpool.engine_options(app.config, uri))
+        for uri in app.config['SQLALCHEMY_REPLICA_URIS']
+    ]
+    if app.extensions['db_replicas']:
+        app.before_request(_pick_replica)
+        app.after_request(_remember_write)
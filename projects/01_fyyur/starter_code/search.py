@@ -0,0 +1,59 @@
+from flask import current_app
+from sqlalchemy import func, or_
+
+from models import db
+
+# immutable wrapper around the searchable columns, created by the
+# search migration so it can back an expression index
+SEARCH_TEXT_FUNCTION = 'fyyur_search_text'
+
+
+def search_text(model):
+    return getattr(func, SEARCH_TEXT_FUNCTION)(model.name, model.city, model.state, model.genres)
+
+
+def _like(term):
+    """ the term is literal text, not a LIKE pattern """
+    return '%{}%'.format(term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+
+
+def _postgres_search(model, term, limit):
+    """ Trigram match over name, city, state and genres.
+
+    ILIKE on the indexed expression is answered from the gin_trgm_ops index.
+    Rows are ranked by how well the term matches the name first, then the
+    whole search text, so "Hop" puts "The Musical Hop" ahead of a venue that
+    merely sits on Hop Street.
+    """
+    text = search_text(model)
+    rank = func.greatest(
+        func.word_similarity(term, model.name) * 2,
+        func.word_similarity(term, text),
+    )
+    return model.query.filter(text.ilike(_like(term), escape='\\')).order_by(
+        rank.desc(), model.name, model.id
+    ).limit(limit).all()
+
+
+def _fallback_search(model, term, limit):
+    pattern = _like(term)
+    return model.query.filter(or_(
+        model.name.ilike(pattern, escape='\\'),
+        model.city.ilike(pattern, escape='\\'),
+        model.state.ilike(pattern, escape='\\'),
+    )).order_by(model.name, model.id).limit(limit).all()
+
+
+def search(model, term, limit=None):
+    """ Case-insensitive partial search on a Venue or Artist, best matches first """
+    limit = limit or current_app.config['SEARCH_RESULT_LIMIT']
+    term = (term or '').strip()
+    if not term:
+        return model.query.order_by(model.name, model.id).limit(limit).all()
+    if db.engine.dialect.name == 'postgresql':
+        return _postgres_search(model, term, limit)
+    return _fallback_search(model, term, limit)
+
+
+def init_app(app):
+    app.config.setdefault('SEARCH_RESULT_LIMIT', 50)
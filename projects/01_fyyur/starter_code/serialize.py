@@ -0,0 +1,26 @@
+import json
+from datetime import date, datetime
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:                      # optional, the stdlib encoder is the fallback
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def dumps(obj):
+    """ Encode to JSON bytes. orjson writes datetimes natively and is several times faster """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(obj, status=200):
+    return current_app.response_class(dumps(obj), status=status, mimetype='application/json')
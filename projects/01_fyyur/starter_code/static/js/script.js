@@ -2,3 +2,35 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// suggest venue and artist names while typing in the navbar search boxes
+(function () {
+  var inputs = document.querySelectorAll('form.search input[name="search_term"]');
+  Array.prototype.forEach.call(inputs, function (input, i) {
+    var list = document.createElement('datalist');
+    var kind = input.form.getAttribute('action').indexOf('/venues') === 0 ? 'venue' : 'artist';
+    var pending = null;
+    list.id = 'typeahead-' + i;
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.parentNode.appendChild(list);
+    input.addEventListener('input', function () {
+      var q = input.value;
+      if (pending) { pending.abort(); }
+      if (!q) { list.innerHTML = ''; return; }
+      pending = new XMLHttpRequest();
+      pending.open('GET', '/api/typeahead?q=' + encodeURIComponent(q));
+      pending.onload = function () {
+        var results = JSON.parse(this.responseText).results;
+        list.innerHTML = '';
+        results.forEach(function (result) {
+          if (result.type !== kind) { return; }
+          var option = document.createElement('option');
+          option.value = result.name;
+          list.appendChild(option);
+        });
+      };
+      pending.send();
+    });
+  });
+})();
@@ -0,0 +1,109 @@
+# Run from starter_code/:  python -m pytest tests
+#
+# Tests using the `postgres` fixture need the real schema, extensions and
+# all: point TEST_DATABASE_URL at an empty Postgres database, which they
+# migrate up and back down. They are skipped without it. The `sqlite`
+# fixture runs the paths that work without Postgres on a temporary file.
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from flask_migrate import downgrade, upgrade
+
+import bookings
+import facets
+import geo
+import typeahead
+from app import create_app
+from models import db, Venue, Artist, Show
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+def make_app(uri, **settings):
+    config = {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SECRET_KEY': 'test',
+        'TESTING': True,
+        'PAGE_CACHE_BACKEND': 'null',           #every request reaches the database
+    }
+    config.update(settings)
+    return create_app(config)
+
+
+@pytest.fixture(scope='session')
+def postgres_app():
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    app = make_app(TEST_DATABASE_URL)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        downgrade(directory=MIGRATIONS, revision='base')
+
+
+@pytest.fixture
+def postgres(postgres_app):
+    """ The migrated Postgres app, inside an app context, with empty tables """
+    with postgres_app.app_context():
+        db.session.execute('TRUNCATE {} RESTART IDENTITY CASCADE'.format(
+            ', '.join(table.name for table in db.metadata.sorted_tables)
+        ))
+        db.session.commit()
+        # emptied behind the in-process indexes' backs: give the app new ones
+        for module in (typeahead, geo, bookings, facets):
+            module.init_app(postgres_app)
+        yield postgres_app
+        db.session.remove()
+
+
+@pytest.fixture
+def sqlite_app(tmp_path):
+    """ make(name='fyyur', **settings): an app on a new SQLite file database, tables created """
+    def make(name='fyyur', **settings):
+        app = make_app('sqlite:///{}'.format(tmp_path / (name + '.db')), **settings)
+        with app.app_context():
+            db.create_all()
+        return app
+    return make
+
+
+@pytest.fixture
+def sqlite(sqlite_app):
+    """ An app on an empty SQLite database, inside an app context """
+    app = sqlite_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def seed():
+    """ seed(count): add count venues, artists and shows. Every show is
+    played by the first artist at the first venue, half of them past, so
+    their detail pages grow with count like the listings do.
+    """
+    def add(count):
+        now = datetime.now().replace(second=0, microsecond=0)
+        start = db.session.query(db.func.count(Venue.id)).scalar()
+        venues = [Venue(name='Venue {}'.format(start + number), city='San Francisco', state='CA',
+                        address='1 Main St', genres=['Jazz', 'Rock'], seeking_talent=bool(number % 2))
+                  for number in range(count)]
+        artists = [Artist(name='Artist {}'.format(start + number), city='San Francisco', state='CA',
+                          genres=['Jazz'], seeking_venue=bool(number % 2))
+                   for number in range(count)]
+        db.session.add_all(venues + artists)
+        db.session.flush()
+        venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+        artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+        for number in range(start, start + count):
+            # one show a day, alternating before and after now
+            start_time = now + timedelta(days=(number // 2 + 1) * (1 if number % 2 else -1))
+            db.session.add(Show(venue_id=venue_id, artist_id=artist_id,
+                                start_time=start_time, end_time=start_time + timedelta(hours=2)))
+        db.session.commit()
+    return add
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize('path, most', [
+    ('/api/v1/shows?limit=-5', 1),
+    ('/api/v1/shows?limit=0', 1),
+    ('/api/v1/shows?limit=100000', 3),
+    ('/api/v1/venues/near?lat=0&lng=0&limit=-1', 1),
+])
+def test_limit_is_clamped(sqlite, seed, path, most):
+    # the app is built from a bare dict: API_MAX_PAGE_SIZE comes from its default
+    seed(3)
+    response = sqlite.test_client().get(path)
+    assert response.status_code == 200
+    assert len(response.get_json()['data']) <= most
@@ -0,0 +1,13 @@
+import os
+
+import assets
+
+
+def test_home_page_links_the_fingerprinted_splash(sqlite_app, tmp_path):
+    static = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+    manifest = assets.build(static, str(tmp_path / 'dist'))
+    app = sqlite_app(ASSETS_FOLDER=str(tmp_path / 'dist'))
+
+    page = app.test_client().get('/').get_data(as_text=True)
+    assert '/assets/' + manifest['img/front-splash.jpg'] in page
+    assert '/static/img/front-splash.jpg' not in page
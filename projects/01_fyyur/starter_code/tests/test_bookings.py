@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import time
+
+import pytest
+
+import bookings
+from models import db, Show
+
+
+@pytest.fixture
+def berlin(monkeypatch):
+    # local time one hour ahead of UTC in winter
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def show_at(start, hours=2):
+    return Show(venue_id=1, artist_id=1, start_time=start, end_time=start + timedelta(hours=hours))
+
+
+def test_a_rolled_back_show_leaves_the_calendar(sqlite, seed):
+    seed(1)
+    start = datetime(2030, 1, 1, 20)
+    bookings.book(show_at(start))
+    with pytest.raises(bookings.DoubleBooking):                       #held until its transaction ends
+        bookings.book(show_at(start + timedelta(hours=1)))
+    db.session.rollback()
+
+    assert bookings.booked(1, start, start + timedelta(hours=2)) == []
+    bookings.book(show_at(start))
+    db.session.commit()
+    assert [show_id for show_start, show_end, show_id in bookings.booked(1, start, start + timedelta(hours=2))] == [2]
+
+
+def test_a_committed_show_joins_the_calendar(sqlite, seed):
+    seed(1)
+    start = datetime(2030, 1, 1, 20)
+    assert bookings.booked(1, start, start + timedelta(hours=2)) == []   #calendar loaded before the booking
+    bookings.book(show_at(start))
+    assert bookings.booked(1, start, start + timedelta(hours=2)) == []
+    db.session.commit()
+
+    assert len(bookings.booked(1, start, start + timedelta(hours=2))) == 1
+    with pytest.raises(bookings.DoubleBooking):
+        bookings.book(show_at(start + timedelta(hours=1)))
+
+
+def test_availability_accepts_utc_offsets(sqlite, seed, berlin):
+    seed(1)
+    start = datetime(2030, 1, 1, 20)
+    bookings.book(show_at(start))
+    db.session.commit()
+
+    response = sqlite.test_client().get('/venues/1/availability?from=2030-01-01T21:00:00%2B02:00&to=2030-01-02T00:00:00Z')
+    assert response.status_code == 200
+    assert response.json['from'].startswith('2030-01-01T20:00')     #21:00+02:00 in Berlin
+    assert [booked['show_id'] for booked in response.json['booked']] == [2]
+    assert sqlite.test_client().get('/venues/1/availability?from=tomorrow').status_code == 400
+
+
+def test_shows_written_elsewhere_drop_only_their_venue(sqlite, seed):
+    sqlite.config['LOCAL_INDEX_MAX_AGE'] = 0
+    seed(2)
+    start = datetime(2030, 1, 1, 20)
+    calendars = bookings.calendars()
+    first, second = calendars.get(1), calendars.get(2)
+
+    # booked by another process, behind this one's calendars
+    db.session.add(Show(venue_id=2, artist_id=1, start_time=start, end_time=start + timedelta(hours=2)))
+    db.session.commit()
+    assert calendars.get(1) is first
+    assert calendars.get(2) is not second
+    assert len(bookings.booked(2, start, start + timedelta(hours=2))) == 1
@@ -0,0 +1,24 @@
+import pytest
+
+from models import db, Venue, Artist
+
+
+def counts(model, id):
+    return db.session.query(model.upcoming_shows_count, model.past_shows_count).filter(model.id == id).one()
+
+
+@pytest.mark.parametrize('args, changed', [
+    (['--full'], 4),                                                  #both venues and both artists
+    (['--lookback', '2880'], 2),                                      #those with a show started in the last two days
+])
+def test_reconcile_repairs_corrupted_counts(sqlite, seed, args, changed):
+    seed(2)                                                           #one past and one upcoming show, at venue 1 by artist 1
+    db.session.query(Venue).update({'upcoming_shows_count': 7, 'past_shows_count': 7})
+    db.session.query(Artist).update({'upcoming_shows_count': 0, 'past_shows_count': 3})
+    db.session.commit()
+
+    result = sqlite.test_cli_runner().invoke(args=['fyyur', 'reconcile-counts'] + args)
+    assert result.exit_code == 0, result.output
+    assert '{} venues/artists changed'.format(changed) in result.output
+    db.session.expire_all()
+    assert counts(Venue, 1) == counts(Artist, 1) == (1, 1)
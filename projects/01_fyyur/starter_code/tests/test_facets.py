@@ -0,0 +1,39 @@
+import cache
+from models import db, Venue
+from querycount import count_queries
+
+
+def test_facet_counts_are_cached_until_the_table_changes(postgres, seed, monkeypatch):
+    monkeypatch.setitem(postgres.extensions, 'page_cache', cache.LocalCache())
+    client = postgres.test_client()
+    seed(2)
+    assert 'Jazz <small>(2)</small>' in client.get('/venues').get_data(as_text=True)
+
+    with count_queries() as counter:
+        client.get('/venues')
+    assert not any('GROUPING SETS' in statement for statement in counter.statements)
+
+    db.session.add(Venue(name='Venue Folk', city='Austin', state='TX', address='2 Main St',
+                         genres=['Jazz', 'Folk'], seeking_talent=False))
+    db.session.commit()
+    monkeypatch.setitem(postgres.config, 'LOCAL_INDEX_MAX_AGE', 0)
+    page = client.get('/venues').get_data(as_text=True)
+    assert 'Jazz <small>(3)</small>' in page
+    assert 'Folk <small>(1)</small>' in page
+
+
+def test_facets_without_postgres(sqlite, seed):
+    client = sqlite.test_client()
+    seed(2)
+    db.session.add(Venue(name='Venue Folk', city='Austin', state='TX', address='2 Main St',
+                         genres=['Folk'], seeking_talent=False))
+    db.session.commit()
+
+    page = client.get('/venues').get_data(as_text=True)
+    assert 'Jazz <small>(2)</small>' in page
+    assert 'Folk <small>(1)</small>' in page
+    assert 'Austin, TX <small>(1)</small>' in page
+
+    page = client.get('/venues?genre=Folk').get_data(as_text=True)
+    assert 'Venue Folk' in page and 'Venue 0' not in page
+    assert client.get('/artists?genre=Jazz&genre=Rock').status_code == 200
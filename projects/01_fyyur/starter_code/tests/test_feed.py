@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import feed
+from models import db, Venue, Artist, Show
+
+
+def titles(section):
+    return [item.title for item in feed.items()[section]]
+
+
+def test_writes_keep_the_feed_current(sqlite, seed):
+    sqlite.config['FEED_SIZE'] = 3
+    seed(2)                                                           #written behind the feed's back
+    feed.rebuild()
+    assert len(titles(feed.RECENT)) == 3                              #the newest FEED_SIZE of the four listings
+    assert titles(feed.UPCOMING) == ['Artist 0']                     #one past show, one upcoming
+
+    venue = Venue(name='Venue New', city='Austin', state='TX', address='2 Main St', genres=['Folk'],
+                  seeking_talent=False, created_at=datetime.utcnow() + timedelta(minutes=1))
+    db.session.add(venue)
+    db.session.flush()
+    feed.listed('venue', [venue.id])
+    start = datetime.now() + timedelta(hours=1)
+    show = Show(venue_id=venue.id, artist_id=1, start_time=start, end_time=start + timedelta(hours=2))
+    db.session.add(show)
+    db.session.flush()
+    feed.booked([show.id])
+    db.session.commit()
+    assert titles(feed.RECENT)[0] == 'Venue New'
+    assert len(titles(feed.RECENT)) == 3                              #trimmed to FEED_SIZE
+    assert [item.subtitle for item in feed.items()[feed.UPCOMING]] == ['Venue New', 'Venue 0']
+
+    venue.name = 'Venue Renamed'
+    db.session.flush()
+    feed.edited('venue', venue.id)
+    db.session.query(Artist).filter(Artist.id == 1).update({'name': 'Artist Renamed'})
+    db.session.flush()
+    feed.edited('artist', 1)
+    db.session.commit()
+    assert titles(feed.RECENT)[0] == 'Venue Renamed'
+    assert [(item.title, item.subtitle) for item in feed.items()[feed.UPCOMING]] == [
+        ('Artist Renamed', 'Venue Renamed'), ('Artist Renamed', 'Venue 0'),
+    ]
+
+    feed.forget('venue', venue.id)
+    db.session.commit()
+    assert 'Venue Renamed' not in titles(feed.RECENT)
+    assert 'Venue Renamed' in sqlite.test_client().get('/').get_data(as_text=True)   #its show is still listed
@@ -0,0 +1,13 @@
+from datetime import datetime
+
+import babel.dates
+import pytest
+
+import formatting
+
+
+@pytest.mark.parametrize('format', ['short', 'long', "EEEE d MMMM 'at' h:mma"])
+@pytest.mark.parametrize('locale', ['en', 'de'])
+def test_babel_formats_match_babel(format, locale):
+    value = datetime(2026, 5, 1, 20, 0)
+    assert formatting.format_datetime(value, format, locale) == babel.dates.format_datetime(value, format, locale=locale)
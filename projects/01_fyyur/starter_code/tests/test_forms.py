@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import pytest
+
+import importer
+
+
+@pytest.mark.parametrize('start_time', ['2030-01-01 20:00:00', '2030-01-01T20:00:00'])
+def test_show_start_time_formats(sqlite, start_time):
+    form = importer.form_class('shows')(formdata=None, meta={'csrf': False})
+    row, errors = importer.validate_record('shows', form, {'venue_id': 1, 'artist_id': 1, 'start_time': start_time})
+    assert errors is None
+    assert row['start_time'] == datetime(2030, 1, 1, 20)
+
+
+@pytest.mark.parametrize('start_time, error', [
+    ('tomorrow', 'Not a valid datetime value'),
+    ('', 'This field is required.'),
+])
+def test_show_start_time_errors(sqlite, start_time, error):
+    form = importer.form_class('shows')(formdata=None, meta={'csrf': False})
+    row, errors = importer.validate_record('shows', form, {'venue_id': 1, 'artist_id': 1, 'start_time': start_time})
+    assert errors == {'start_time': [error]}
@@ -0,0 +1,10 @@
+def test_fragment_cache_is_sized_from_config(sqlite_app):
+    app = sqlite_app(FRAGMENT_CACHE_MAX_ENTRIES=2, FRAGMENT_CACHE_TTL=60)
+    store = app.jinja_env.fragment_cache
+    assert (store.max_entries, store.ttl) == (2, 60)
+
+    template = app.jinja_env.from_string("{% cache 'tile', id %}{{ id }}-{{ calls.append(id) or '' }}{% endcache %}")
+    calls = []
+    for id in (1, 1, 2, 3, 1):
+        template.render(id=id, calls=calls)
+    assert calls == [1, 2, 3, 1]                                      #1 was the least recent of three, dropped
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+import geo
+from models import db, Venue
+
+POINTS = [(37.77, -122.42), (37.80, -122.27), (34.05, -118.24), (40.71, -74.01),
+          (64.84, -147.72), (-33.87, 151.21), (-36.85, 174.76), (89.90, 10.0), (0.0, 179.99), (0.0, -179.99)]
+
+
+def brute_force(points, lat, lng, radius_km=None, limit=20):
+    found = sorted((geo.distance_km(lat, lng, *point), id) for id, point in enumerate(points))
+    if radius_km is not None:
+        found = [(distance, id) for distance, id in found if distance <= radius_km]
+    return found[:limit]
+
+
+@pytest.mark.parametrize('lat, lng', [(37.7, -122.4), (0.0, 180.0), (89.0, -170.0), (-35.0, 160.0)])
+@pytest.mark.parametrize('radius_km', [None, 50, 2000, 20000])
+def test_grid_index_agrees_with_brute_force(lat, lng, radius_km):
+    # a grid search only looks at some cells, it must find what scanning every point finds,
+    # across the antimeridian and near the poles too
+    generator = random.Random(7)
+    points = POINTS + [(generator.uniform(-90, 90), generator.uniform(-180, 180)) for number in range(300)]
+    index = geo.GridIndex()
+    index.load((id, point[0], point[1]) for id, point in enumerate(points))
+    if radius_km is None:
+        assert index.nearest(lat, lng, 5) == brute_force(points, lat, lng, limit=5)
+    else:
+        assert index.within(lat, lng, radius_km, 20) == brute_force(points, lat, lng, radius_km, 20)
+
+
+def test_near_without_postgres(sqlite):
+    for number, (lat, lng) in enumerate(POINTS[:4]):
+        db.session.add(Venue(name='Venue {}'.format(number), city='City', state='CA', address='1 Main St',
+                             genres=['Jazz'], seeking_talent=False, latitude=lat, longitude=lng))
+    db.session.commit()
+    client = sqlite.test_client()
+
+    nearest = client.get('/api/v1/venues/near?lat=37.78&lng=-122.41&limit=2').get_json()['data']
+    assert [venue['name'] for venue in nearest] == ['Venue 0', 'Venue 1']
+    assert nearest[0]['distance_km'] < nearest[1]['distance_km']
+
+    within = client.get('/api/v1/venues/near?lat=37.78&lng=-122.41&radius_km=600').get_json()['data']
+    assert [venue['name'] for venue in within] == ['Venue 0', 'Venue 1', 'Venue 2']
+
+    # venues written behind the index's back, by another process, are moved into place
+    index = sqlite.extensions['fyyur']['geo']
+    loads = []
+    load = index.load
+    index.load = lambda records: loads.append(1) or load(records)
+    db.session.add(Venue(name='Venue Oakland', city='Oakland', state='CA', address='2 Main St',
+                         genres=['Jazz'], seeking_talent=False, latitude=37.78, longitude=-122.40))
+    moved = db.session.query(Venue).filter(Venue.name == 'Venue 0').one()
+    moved.latitude, moved.longitude = None, None
+    db.session.commit()
+    sqlite.config['LOCAL_INDEX_MAX_AGE'] = 0
+    nearest = client.get('/api/v1/venues/near?lat=37.78&lng=-122.41&limit=2').get_json()['data']
+    assert [venue['name'] for venue in nearest] == ['Venue Oakland', 'Venue 1']
+    assert loads == []
+
+    db.session.query(Venue).filter(Venue.name == 'Venue Oakland').delete()
+    db.session.commit()
+    assert client.get('/api/v1/venues/near?lat=37.78&lng=-122.41&limit=1').get_json()['data'][0]['name'] == 'Venue 1'
+    assert loads == [1]
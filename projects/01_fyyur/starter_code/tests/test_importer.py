@@ -0,0 +1,26 @@
+from importer import import_records
+
+
+def test_imports_reach_the_web_workers(sqlite_app, seed):
+    # two apps on one database: a web worker with its own page cache and an
+    # import run from the CLI, which cannot invalidate that cache
+    web = sqlite_app(PAGE_CACHE_BACKEND='local', LOCAL_INDEX_MAX_AGE=0)
+    cli = sqlite_app()
+    client = web.test_client()
+    with web.app_context():
+        seed(2)
+        assert '1 Upcoming Show' in client.get('/venues/1').get_data(as_text=True)
+        assert client.get('/api/typeahead?q=imported').get_json()['results'] == []
+
+    with cli.app_context():
+        assert import_records('shows', [(1, {
+            'venue_id': '1', 'artist_id': '1', 'start_time': '2099-01-01 20:00:00', 'duration': '90',
+        })]) == (1, 0)
+        assert import_records('artists', [(1, {
+            'name': 'Imported Artist', 'city': 'Austin', 'state': 'TX', 'genres': 'Folk',
+            'phone': '512-555-0100', 'facebook_link': 'https://www.facebook.com/imported',
+        })]) == (1, 0)
+
+    with web.app_context():
+        assert '2 Upcoming Shows' in client.get('/venues/1').get_data(as_text=True)
+        assert [result['name'] for result in client.get('/api/typeahead?q=imported').get_json()['results']] == ['Imported Artist']
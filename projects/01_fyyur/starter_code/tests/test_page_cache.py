@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+import sys
+
+import pytest
+
+import cache
+from models import db, Show
+
+
+class StubRedis(object):
+    # what SharedCache uses of redis.Redis, which answers with bytes
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode('utf-8')
+        self.expiries[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+def test_cached_page_is_not_served_under_a_newer_etag(sqlite_app, seed):
+    app = sqlite_app(PAGE_CACHE_BACKEND='local')
+    client = app.test_client()
+    with app.app_context():
+        seed(2)                                                       #venue 1: one past show, one upcoming
+        first = client.get('/venues/1')
+        assert '1 Upcoming Show' in first.get_data(as_text=True)
+        assert client.get('/venues/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+        # the upcoming show starts: nothing is written (updated_at is kept), so
+        # no invalidation runs and only the passing of time can move the etag
+        upcoming = db.session.query(Show).filter(Show.start_time > datetime.now()).one()
+        db.session.execute(Show.__table__.update().where(Show.id == upcoming.id).values(
+            start_time=datetime.now() - timedelta(minutes=1), updated_at=Show.updated_at,
+        ))
+        db.session.commit()
+
+        second = client.get('/venues/1')
+        assert second.headers['ETag'] != first.headers['ETag']
+        assert '0 Upcoming Shows' in second.get_data(as_text=True)
+        assert '2 Past Shows' in second.get_data(as_text=True)
+
+
+def test_versioned_entries_in_a_shared_cache(sqlite, monkeypatch):
+    client = StubRedis()
+    monkeypatch.setitem(sqlite.extensions, 'page_cache', cache.SharedCache(client, ttl=60))
+    cache.set_versioned('facets:venue', 'v1', 'Jazz \u266b')
+
+    assert client.expiries == {'fyyur:facets:venue': 60}
+    assert cache.get_versioned('facets:venue', 'v1') == 'Jazz \u266b'
+    assert cache.get_versioned('facets:venue', 'v2') is None
+    cache.set_page('venue', 1, '"etag"', '<html>')
+    assert cache.get_page('venue', 1, '"etag"') == '<html>'
+    cache.invalidate('venue', 1)
+    assert cache.get_page('venue', 1, '"etag"') is None
+
+
+def test_the_redis_backend_needs_redis(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'redis', None)                   #not installed
+    with pytest.raises(RuntimeError, match='pip install redis'):
+        cache.create_backend({'PAGE_CACHE_BACKEND': 'redis', 'PAGE_CACHE_URL': 'redis://localhost', 'PAGE_CACHE_TTL': 60})
@@ -0,0 +1,40 @@
+import pytest
+
+import config
+from querycount import count_queries
+
+# every listing, detail and search page: a query count that grows with the
+# number of rows is an N+1 lazy load
+PAGES = [
+    ('GET', '/venues', None),
+    ('GET', '/artists', None),
+    ('GET', '/shows', None),
+    ('GET', '/venues/1', None),
+    ('GET', '/artists/1', None),
+    ('POST', '/venues/search', {'search_term': 'venue'}),
+    ('POST', '/artists/search', {'search_term': 'artist'}),
+]
+
+
+def queries_of(client, method, path, data):
+    with count_queries() as counter:
+        response = client.open(path, method=method, data=data)
+    assert response.status_code == 200
+    return counter.count
+
+
+@pytest.mark.parametrize('method, path, data', PAGES)
+def test_query_count_does_not_grow_with_rows(postgres, seed, method, path, data, monkeypatch):
+    monkeypatch.setitem(postgres.config, 'LOCAL_INDEX_MAX_AGE', 0)      #table versions read on every request
+    client = postgres.test_client()
+    seed(5)
+    few = queries_of(client, method, path, data)
+    seed(5)
+    assert queries_of(client, method, path, data) == few
+
+
+@pytest.mark.parametrize('endpoint, path', [('venues', '/venues'), ('artists', '/artists')])
+def test_a_cold_cache_stays_within_the_budget(postgres, seed, endpoint, path):
+    # a new worker: nothing cached, the table version not read yet
+    seed(5)
+    assert queries_of(postgres.test_client(), 'GET', path, None) <= config.QUERY_BUDGETS[endpoint]
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+import recommend
+from models import db, Venue, Artist, Recommendation
+
+GENRES = ['Jazz', 'Rock', 'Folk', 'Blues', 'Hip-Hop', 'Classical']
+PLACES = [('San Francisco', 'CA'), ('Oakland', 'CA'), ('Austin', 'TX'), ('New York', 'NY')]
+
+
+def add_random(generator, model, name, **fields):
+    city, state = generator.choice(PLACES)
+    seeking = 'seeking_talent' if model is Venue else 'seeking_venue'
+    values = dict(name=name, city=city, state=state, genres=generator.sample(GENRES, generator.randint(1, 3)),
+                  **{seeking: generator.random() < 0.8})
+    if model is Venue:
+        values['address'] = '1 Main St'
+    values.update(fields)
+    row = model(**values)
+    db.session.add(row)
+    db.session.flush()
+    return row
+
+
+def stored():
+    """ subject -> id -> scores of its list, best first (which of two equal scores is kept may differ) """
+    lists = {}
+    for row in db.session.query(Recommendation).order_by(Recommendation.rank):
+        own = row.artist_id if row.subject == 'artist' else row.venue_id
+        lists.setdefault(row.subject, {}).setdefault(own, []).append(round(row.score, 5))
+    return lists
+
+
+@pytest.fixture
+def scored(sqlite):
+    generator = random.Random(3)
+    for number in range(30):
+        add_random(generator, Venue, 'Venue {}'.format(number))
+        add_random(generator, Artist, 'Artist {}'.format(number))
+    db.session.commit()
+    assert recommend.available()
+    recommend.refresh_all()
+    return generator
+
+
+def test_refresh_matches_a_full_refresh(scored):
+    venue = add_random(scored, Venue, 'Venue New', genres=['Jazz', 'Rock'], seeking_talent=True)
+    db.session.commit()
+    recommend.refresh('venue', [venue.id])
+    incremental = stored()
+    recommend.refresh_all()
+    assert incremental == stored()
+
+    # an edit that drops the venue out of the lists it entered
+    venue.genres = ['Polka']
+    db.session.commit()
+    recommend.refresh('venue', [venue.id])
+    incremental = stored()
+    recommend.refresh_all()
+    assert incremental == stored()
+
+
+def test_refresh_failures_do_not_fail_the_write(sqlite, monkeypatch, caplog):
+    def broken(*args, **kwargs):
+        raise RuntimeError('no scores today')
+    monkeypatch.setattr(recommend, 'load_features', broken)
+
+    response = sqlite.test_client().post('/venues/create', data={
+        'name': 'Venue Broken', 'city': 'Austin', 'state': 'TX', 'address': '2 Main St',
+        'phone': '512-555-0100', 'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/venue',
+    })
+    assert response.status_code == 302
+    assert db.session.query(Venue.name).scalar() == 'Venue Broken'
+    assert 'Could not refresh the suggestions of venue' in caplog.text
+
+
+def test_rebuild_failures_do_not_fail_the_delete(sqlite, monkeypatch, caplog):
+    def broken(*args, **kwargs):
+        raise RuntimeError('no scores today')
+    monkeypatch.setattr(recommend, 'load_features', broken)
+    monkeypatch.setattr(recommend, 'suggested_to', lambda subject, id: [1])     #an artist listing the venue
+    db.session.add(Venue(name='Venue Gone', city='Austin', state='TX', address='2 Main St',
+                         genres=['Jazz'], seeking_talent=True))
+    db.session.commit()
+
+    assert sqlite.test_client().post('/venues/1').status_code == 302
+    assert db.session.query(Venue).count() == 0
+    assert 'Could not rebuild the suggestions of artist [1]' in caplog.text
@@ -0,0 +1,36 @@
+from models import db, Venue
+from routing import PRIMARY_COOKIE
+
+
+def add_venue(app, name):
+    with app.app_context():
+        db.session.add(Venue(name=name, city='San Francisco', state='CA', address='1 Main St',
+                             genres=['Jazz'], seeking_talent=False))
+        db.session.commit()
+
+
+def test_reads_go_to_the_replica_until_a_write(sqlite_app):
+    # two databases holding different rows tell which one answered
+    replica = sqlite_app('replica')
+    app = sqlite_app('primary', SQLALCHEMY_REPLICA_URIS=[replica.config['SQLALCHEMY_DATABASE_URI']])
+    add_venue(app, 'Primary Hall')
+    add_venue(app, 'Deleted Hall')
+    add_venue(replica, 'Replica Hall')
+    client = app.test_client()
+
+    page = client.get('/venues/1').get_data(as_text=True)
+    assert 'Replica Hall' in page and 'Primary Hall' not in page
+
+    response = client.post('/venues/search', data={'search_term': 'hall'})
+    assert 'Replica Hall' in response.get_data(as_text=True)
+    assert 'Set-Cookie' not in response.headers                      #a search is not a write
+
+    response = client.post('/venues/2')                              #delete_venue, on the primary
+    assert response.status_code == 302
+    assert PRIMARY_COOKIE in response.headers['Set-Cookie']
+    with app.app_context():
+        assert [name for name, in db.session.query(Venue.name)] == ['Primary Hall']
+
+    # read your own writes: the primary answers for READ_YOUR_WRITES_SECONDS
+    page = client.get('/venues/1').get_data(as_text=True)
+    assert 'Primary Hall' in page and 'Replica Hall' not in page
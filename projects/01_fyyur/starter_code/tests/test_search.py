@@ -0,0 +1,29 @@
+import pytest
+
+import search
+from models import db, Venue, Artist
+
+
+@pytest.mark.parametrize('term, expected', [
+    ('hop', ['The Musical Hop']),
+    ('MUSIC', ['Park Square Live Music & Coffee', 'The Musical Hop']),
+    ('san francisco', ['Park Square Live Music & Coffee', 'The Musical Hop']),
+    ('100%', []),                                                     #% is literal text
+    ('', ['Park Square Live Music & Coffee', 'The Dueling Pianos Bar', 'The Musical Hop']),
+])
+def test_fallback_search(sqlite, term, expected):
+    # the search outside Postgres: partial, case-insensitive, on name, city and state
+    for name, city, state in [('The Musical Hop', 'San Francisco', 'CA'),
+                              ('The Dueling Pianos Bar', 'New York', 'NY'),
+                              ('Park Square Live Music & Coffee', 'San Francisco', 'CA')]:
+        db.session.add(Venue(name=name, city=city, state=state, address='1 Main St',
+                             genres=['Jazz'], seeking_talent=False))
+    assert [venue.name for venue in search.search(Venue, term)] == expected
+
+
+def test_search_page(sqlite, seed):
+    seed(3)
+    response = sqlite.test_client().post('/artists/search', data={'search_term': 'artist 1'})
+    assert response.status_code == 200
+    assert 'Artist 1' in response.get_data(as_text=True)
+    assert search.search(Artist, 'artist', limit=2)[-1].name == 'Artist 1'
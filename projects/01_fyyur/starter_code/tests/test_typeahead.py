@@ -0,0 +1,57 @@
+from models import db, Venue
+
+
+def names(client, q):
+    return [result['name'] for result in client.get('/api/typeahead?q=' + q).get_json()['results']]
+
+
+def test_writes_of_other_processes_reach_the_index(postgres, seed, monkeypatch):
+    client = postgres.test_client()
+    seed(2)
+    assert names(client, 'venue') == ['Venue 0', 'Venue 1']
+
+    # written behind the index's back, as by another worker or the importer
+    db.session.add(Venue(name='Venue Imported', city='Austin', state='TX', address='2 Main St',
+                         genres=['Folk'], seeking_talent=False))
+    db.session.query(Venue).filter(Venue.name == 'Venue 1').delete()
+    db.session.commit()
+    assert names(client, 'venue') == ['Venue 0', 'Venue 1']         #within LOCAL_INDEX_MAX_AGE
+
+    monkeypatch.setitem(postgres.config, 'LOCAL_INDEX_MAX_AGE', 0)
+    assert names(client, 'venue') == ['Venue 0', 'Venue Imported']
+
+
+def test_each_app_has_its_own_index(sqlite_app):
+    first, second = sqlite_app('first'), sqlite_app('second')
+    for app, name in ((first, 'Venue First'), (second, 'Venue Second')):
+        with app.app_context():
+            db.session.add(Venue(name=name, city='Austin', state='TX', address='2 Main St',
+                                 genres=['Folk'], seeking_talent=False))
+            db.session.commit()
+    assert names(first.test_client(), 'venue') == ['Venue First']
+    assert names(second.test_client(), 'venue') == ['Venue Second']
+
+
+def test_writes_elsewhere_are_applied_without_a_reload(sqlite, seed, monkeypatch):
+    sqlite.config['LOCAL_INDEX_MAX_AGE'] = 0
+    client = sqlite.test_client()
+    seed(2)
+    assert names(client, 'venue') == ['Venue 0', 'Venue 1']
+    index = sqlite.extensions['fyyur']['typeahead']
+    loads = []
+    monkeypatch.setattr(index, 'load', lambda records: loads.append(records))
+
+    db.session.add(Venue(name='Venue Imported', city='Austin', state='TX', address='2 Main St',
+                         genres=['Folk'], seeking_talent=False))
+    db.session.query(Venue).filter(Venue.name == 'Venue 1').one().name = 'Venue Renamed'
+    db.session.commit()
+    assert names(client, 'venue') == ['Venue 0', 'Venue Imported', 'Venue Renamed']
+    assert loads == []
+
+    # a delete (here with an insert, so the count stays put) is only seen by reloading
+    db.session.query(Venue).filter(Venue.name == 'Venue Imported').delete()
+    db.session.add(Venue(name='Venue Later', city='Austin', state='TX', address='2 Main St',
+                         genres=['Folk'], seeking_talent=False))
+    db.session.commit()
+    names(client, 'venue')
+    assert len(loads) == 1
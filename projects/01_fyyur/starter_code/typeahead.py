@@ -0,0 +1,136 @@
+import threading
+from bisect import bisect_left, insort
+
+from flask import current_app
+
+import cache
+from models import db, Venue, Artist
+
+
+def _fold(text):
+    return (text or '').casefold()
+
+
+class PrefixIndex(object):
+    """ Sorted array of (folded word suffix, kind, id, name) entries.
+
+    Every word of a name is an entry point, so "mus" finds "The Musical Hop".
+    A lookup is two binary searches plus the matches returned; add/remove
+    keep the array sorted so writes never trigger a rebuild.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._keys = {}                   #(kind, id) -> entries of that record, for removal
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def _entries_for(self, kind, id, name):
+        folded = _fold(name)
+        entries = []
+        for position, char in enumerate(folded):
+            if position == 0 or (folded[position - 1].isspace() and not char.isspace()):
+                entries.append((folded[position:], kind, id, name))
+        return entries
+
+    def add(self, kind, id, name):
+        with self._lock:
+            self.remove(kind, id)
+            entries = self._entries_for(kind, id, name)
+            for entry in entries:
+                insort(self._entries, entry)
+            self._keys[(kind, id)] = entries
+
+    def remove(self, kind, id):
+        with self._lock:
+            for entry in self._keys.pop((kind, id), ()):
+                position = bisect_left(self._entries, entry)
+                if position < len(self._entries) and self._entries[position] == entry:
+                    del self._entries[position]
+
+    def load(self, records):
+        """ Replace the contents with (kind, id, name) records in one sort """
+        with self._lock:
+            self._keys = {}
+            entries = []
+            for kind, id, name in records:
+                self._keys[(kind, id)] = self._entries_for(kind, id, name)
+                entries.extend(self._keys[(kind, id)])
+            entries.sort()
+            self._entries = entries
+            self.loaded = True
+
+    def lookup(self, prefix, limit=10):
+        prefix = _fold(prefix).strip()
+        if not prefix:
+            return []
+        with self._lock:
+            results = []
+            seen = set()
+            position = bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(results) < limit:
+                key, kind, id, name = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                if (kind, id) not in seen:
+                    seen.add((kind, id))
+                    results.append({"type": kind, "id": id, "name": name})
+                position += 1
+            return results
+
+
+def _state():
+    return current_app.extensions['fyyur']
+
+
+def ensure_loaded():
+    """ The app's index, filled from the database the first time it is used
+    in this process.
+
+    record_*/forget_venue only reach this process' index; names written by
+    other workers or `flask fyyur import` are added within LOCAL_INDEX_MAX_AGE,
+    and only a delete elsewhere makes it load every name again.
+    """
+    index = _state()['typeahead']
+    changes = [(kind, _state()['typeahead_changes'][kind].poll()) for kind in ('venue', 'artist')]
+    if not index.loaded or any(reload for kind, (reload, rows) in changes):
+        records = [('venue', id, name) for id, name in db.session.query(Venue.id, Venue.name)]
+        records.extend(('artist', id, name) for id, name in db.session.query(Artist.id, Artist.name))
+        index.load(records)
+    else:
+        for kind, (reload, rows) in changes:
+            for id, name in rows:
+                index.add(kind, id, name)
+    return index
+
+
+def record_venue(venue):
+    record_names('venue', [(venue.id, venue.name)])
+
+
+def record_artist(artist):
+    record_names('artist', [(artist.id, artist.name)])
+
+
+def record_names(kind, records):
+    """ record_venue/record_artist for many (id, name) pairs at once """
+    index = _state()['typeahead']
+    if index.loaded:
+        for id, name in records:
+            index.add(kind, id, name)
+
+
+def forget_venue(venue_id):
+    index = _state()['typeahead']
+    if index.loaded:
+        index.remove('venue', int(venue_id))
+        _state()['typeahead_changes']['venue'].forgotten()
+
+
+def init_app(app):
+    app.extensions['fyyur']['typeahead'] = PrefixIndex()
+    app.extensions['fyyur']['typeahead_changes'] = {
+        'venue': cache.TableChanges(Venue, Venue.id, Venue.name),
+        'artist': cache.TableChanges(Artist, Artist.id, Artist.name),
+    }
+
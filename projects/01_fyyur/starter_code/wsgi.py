@@ -0,0 +1,33 @@
+import time
+
+started = time.perf_counter()
+
+import os
+
+import routing
+from app import create_app
+from models import db
+
+application = create_app(os.environ.get('FYYUR_CONFIG', 'config'), cli=False)
+
+
+def dispose_engines(app=application):
+    """ Close the pooled connections of the primary and replica engines.
+
+    Under `gunicorn --preload` (see gunicorn.conf.py) the app is built once
+    in the master and every worker is a fork of it, sharing its memory
+    pages. A connection opened before the fork would be one socket used by
+    every worker: the pools are emptied before forking and again in each
+    worker, so each opens its own.
+    """
+    for engine in [db.get_engine(app)] + routing.replica_engines(app):
+        engine.dispose()
+
+
+dispose_engines()
+os.register_at_fork(after_in_child=dispose_engines)
+
+ready_ms = (time.perf_counter() - started) * 1000
+if application.config.get('COLD_START_BUDGET_MS') and ready_ms > application.config['COLD_START_BUDGET_MS']:
+    application.logger.warning('Cold start took %d ms, over the %d ms budget; see benchmarks/cold_start.py',
+                               ready_ms, application.config['COLD_START_BUDGET_MS'])